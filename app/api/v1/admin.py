@@ -0,0 +1,48 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.dependencies import get_user_read_db, require_admin
+from app.repositories.stats_repo import AsyncStatsRepository
+from app.schemas.stats import AdminStats
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+# Диапазон дашборда: сводки по дням, поэтому время ответа зависит от числа дней, а не заказов
+MAX_STATS_DAYS = 366
+
+@router.get("/stats", response_model=AdminStats)
+async def get_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    top: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: bool = Depends(require_admin),
+):
+    """Выручка по дням, лидеры продаж и промокоды из сводок (по умолчанию — последние 30 дней, UTC)"""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days >= MAX_STATS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must not exceed {MAX_STATS_DAYS} days")
+
+    rows = {row["day"]: row for row in await AsyncStatsRepository.get_daily(db, date_from, date_to)}
+    # Дни без заказов — нулями, чтобы график не пропускал даты
+    daily = [
+        rows.get(day) or {"day": day}
+        for day in (date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1))
+    ]
+    totals = {
+        "orders_count": sum(row["orders_count"] for row in rows.values()),
+        "items_sold": sum(row["items_sold"] for row in rows.values()),
+        "revenue": round(sum(row["revenue"] for row in rows.values()), 2),
+    }
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": totals,
+        "daily": daily,
+        "top_products": await AsyncStatsRepository.get_top_products(db, top),
+        "promos": await AsyncStatsRepository.get_promos(db, date_from, date_to),
+    }
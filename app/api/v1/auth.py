@@ -1,28 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import verify_password, create_access_token
-from app.repositories.user_repo import UserRepository
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.hashing import HashingBusy, verify_password_async, hash_password_async
+from app.core.security import create_access_token, password_needs_rehash
+from app.repositories.user_repo import AsyncUserRepository
 from app.schemas.user import UserLogin, Token, UserCreate, UserOut
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = UserRepository.get_by_email(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await AsyncUserRepository.get_by_email(db, form_data.username)
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
+
+    # Хэш со старой стоимостью (BCRYPT_ROUNDS изменился) пересчитываем при входе
+    if password_needs_rehash(user.hashed_password):
+        try:
+            new_hash = await hash_password_async(form_data.password)
+        except HashingBusy:
+            pass
+        else:
+            await AsyncUserRepository.update_password_hash(db, user, new_hash)
     
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserOut)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    if UserRepository.get_by_email(db, user_data.email):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await AsyncUserRepository.get_by_email(db, user_data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    return UserRepository.create(db, user_data)
\ No newline at end of file
+    return await AsyncUserRepository.create(db, user_data)
\ No newline at end of file
@@ -1,41 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.core.dependencies import get_current_user
-from app.repositories.cart_repo import CartRepository
-from app.repositories.promo_repo import PromoCodeRepository
+from app.repositories.cart_repo import AsyncCartRepository
+from app.repositories.promo_repo import AsyncPromoCodeRepository
+from app.schemas.cart import CartBatchUpdate, CartSummary
 from app.schemas.promo import ApplyPromoCode
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
 @router.get("/")
-def get_cart(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    cart = CartRepository.get_or_create_cart(db, current_user.id)
+async def get_cart(db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    cart = await AsyncCartRepository.get_or_create_cart(db, current_user.id)
     return cart
 
+@router.get("/summary", response_model=CartSummary)
+async def get_cart_summary(db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    # Итоги без загрузки графа корзины: для значка в шапке и страницы оформления
+    return await AsyncCartRepository.get_summary(db, current_user.id)
+
 @router.post("/items")
-def add_to_cart(product_id: int, quantity: int = 1, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    CartRepository.add_to_cart(db, current_user.id, product_id, quantity)
+async def add_to_cart(product_id: int, quantity: int = Query(1, ge=1), db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    if not await AsyncCartRepository.add_to_cart(db, current_user.id, product_id, quantity):
+        raise HTTPException(status_code=404, detail="Product not found")
     return {"message": "Product added to cart"}
 
+@router.post("/items:batch")
+async def update_cart_items_batch(batch: CartBatchUpdate, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    # При повторе товара в запросе побеждает последнее значение
+    quantities = {item.product_id: item.quantity for item in batch.items}
+    if not await AsyncCartRepository.set_quantities(db, current_user.id, quantities):
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {"message": "Cart updated"}
+
 @router.put("/items/{item_id}")
-def update_cart_item(item_id: int, quantity: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    CartRepository.update_cart_item(db, current_user.id, item_id, quantity)
+async def update_cart_item(item_id: int, quantity: int, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    if not await AsyncCartRepository.update_cart_item(db, current_user.id, item_id, quantity):
+        raise HTTPException(status_code=404, detail="Cart item not found")
     return {"message": "Cart item updated"}
 
 @router.post("/apply-promo")
-def apply_promo_code(promo_data: ApplyPromoCode, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    cart = CartRepository.get_or_create_cart(db, current_user.id)
-    promo, error = PromoCodeRepository.apply_promo_code(db, promo_data.promo_code, cart)
+async def apply_promo_code(promo_data: ApplyPromoCode, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    cart_id, product_ids = await AsyncCartRepository.get_cart_product_ids(db, current_user.id)
+    promo, error = await AsyncPromoCodeRepository.apply_promo_code(db, promo_data.promo_code, cart_id, product_ids)
     
     if error:
         raise HTTPException(status_code=400, detail=error)
     
-    cart.promo_code_id = promo.id
-    db.commit()
     return {"message": "Promo code applied successfully"}
 
 @router.delete("/")
-def clear_cart(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    CartRepository.clear_cart(db, current_user.id)
+async def clear_cart(db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user)):
+    await AsyncCartRepository.clear_cart(db, current_user.id)
     return {"message": "Cart cleared"}
\ No newline at end of file
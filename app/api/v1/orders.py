@@ -1,30 +1,167 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.dependencies import get_current_user, require_admin
-from app.repositories.order_repo import OrderRepository
-from app.schemas.order import OrderCreate, OrderOut
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.dependencies import get_current_user, get_user_read_db, require_admin
+from app.core.idempotency import run_once
+from app.core.outbox import outbox_worker
+from app.core.replica import note_write, read_session
+from app.core.serialization import json_list_response
+from app.models.order import OrderStatus
+from app.repositories.order_repo import AsyncOrderRepository
+from app.schemas.order import OrderCreate, OrderOut, OrderPage, OrderStatusUpdate
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+EXPORT_HEADER = [
+    "order_id", "created_at", "status", "user_id", "total_amount", "promo_code_id",
+    "customer_name", "customer_phone", "customer_email", "delivery_address",
+    "product_id", "quantity", "price",
+]
+
 @router.post("/", response_model=OrderOut)
-def create_order(order_data: OrderCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    order = OrderRepository.create_from_cart(db, current_user.id, order_data.dict())
-    if not order:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-    return order
+async def create_order(
+    order_data: OrderCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+):
+    if idempotency_key is None:
+        order, error = await AsyncOrderRepository.create_from_cart(db, current_user.id, order_data.dict())
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        note_write(current_user.id)
+        outbox_worker.notify()
+        return order
+
+    # Повтор с тем же ключом получает ответ первой попытки вместо второго оформления
+    async def checkout(complete):
+        body = None
+
+        async def save_response(order):
+            # Ответ сохраняется в транзакции заказа
+            nonlocal body
+            body = OrderOut.model_validate(order, from_attributes=True).model_dump_json()
+            await complete(200, body)
+
+        order, error = await AsyncOrderRepository.create_from_cart(
+            db, current_user.id, order_data.dict(), before_commit=save_response
+        )
+        if error:
+            return 400, json.dumps({"detail": error})
+        note_write(current_user.id)
+        outbox_worker.notify()
+        return 200, body
+
+    return await run_once(db, current_user.id, idempotency_key, order_data.model_dump(mode="json"), checkout)
 
 @router.get("/", response_model=list[OrderOut])
-def get_user_orders(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    return OrderRepository.get_user_orders(db, current_user.id)
+async def get_user_orders(db: AsyncSession = Depends(get_user_read_db), current_user = Depends(get_current_user)):
+    rows = await AsyncOrderRepository.get_user_order_rows(db, current_user.id)
+    return json_list_response(OrderOut, rows)
 
 @router.get("/{order_id}", response_model=OrderOut)
-def get_order(order_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    order = OrderRepository.get_order_by_id(db, order_id, current_user.id)
+async def get_order(order_id: int, db: AsyncSession = Depends(get_user_read_db), current_user = Depends(get_current_user)):
+    order = await AsyncOrderRepository.get_order_by_id(db, order_id, current_user.id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
-@router.get("/admin/all", response_model=list[OrderOut])
-def get_all_orders(db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    return db.query(Order).order_by(Order.created_at.desc()).all()
\ No newline at end of file
+@router.put("/{order_id}/status", response_model=OrderOut)
+async def update_order_status(
+    order_id: int,
+    update: OrderStatusUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    admin = Depends(require_admin),
+):
+    order = await AsyncOrderRepository.update_status(db, order_id, update.status)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    note_write(admin.id)
+    outbox_worker.notify()
+    return order
+
+@router.get("/admin/all", response_model=OrderPage)
+async def get_all_orders(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[OrderStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_user_read_db),
+    admin: bool = Depends(require_admin),
+):
+    try:
+        items, next_cursor = await AsyncOrderRepository.get_page(
+            db, limit=limit, cursor=cursor, status=status, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, OrderStatus):
+        return value.value
+    return value
+
+async def _export_csv(user_id: int, filters: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    # Своя сессия: генератор работает уже после выхода из обработчика
+    async with read_session(user_id) as db:
+        async for row in AsyncOrderRepository.stream_export_rows(db, **filters):
+            writer.writerow([_export_value(value) for value in row])
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+async def _export_ndjson(user_id: int, filters: dict):
+    # Строки идут по возрастанию id заказа: позиции собираем, пока id не сменится
+    order, chunk = None, []
+    async with read_session(user_id) as db:
+        async for row in AsyncOrderRepository.stream_export_rows(db, **filters):
+            values = dict(zip(EXPORT_HEADER, (_export_value(value) for value in row)))
+            if order is None or order["id"] != values["order_id"]:
+                if order is not None:
+                    chunk.append(json.dumps(order, ensure_ascii=False))
+                    if len(chunk) >= 500:
+                        yield "\n".join(chunk) + "\n"
+                        chunk = []
+                order = {key: values[key] for key in EXPORT_HEADER[1:10]}
+                order = {"id": values["order_id"], **order, "items": []}
+            if values["product_id"] is not None:
+                order["items"].append({key: values[key] for key in ("product_id", "quantity", "price")})
+    if order is not None:
+        chunk.append(json.dumps(order, ensure_ascii=False))
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+@router.get("/admin/export")
+async def export_orders(
+    format: Literal["csv", "ndjson"] = "csv",
+    status: Optional[OrderStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    admin: bool = Depends(require_admin),
+):
+    """Потоковая выгрузка заказов: память не зависит от числа заказов"""
+    filters = {"status": status, "date_from": date_from, "date_to": date_to}
+    if format == "csv":
+        body, media_type = _export_csv(admin.id, filters), "text/csv"
+    else:
+        body, media_type = _export_ndjson(admin.id, filters), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+    )
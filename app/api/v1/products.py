@@ -1,37 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import catalog_cache
+from app.core.database import get_async_db
 from app.core.dependencies import require_admin
-from app.repositories.product_repo import ProductRepository
-from app.schemas.product import ProductCreate, ProductUpdate, ProductOut
+from app.core.replica import get_read_db, note_write
+from app.core.etag import make_etag, json_response
+from app.repositories.product_repo import AsyncProductRepository
+from app.models.product import ProductStatus
+from app.schemas.product import ProductCreate, ProductUpdate, ProductOut, ProductPage
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-@router.get("/", response_model=list[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    return ProductRepository.get_all(db)
+async def catalog_page(
+    db: AsyncSession,
+    limit: int = 24,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    status: Optional[ProductStatus] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+):
+    """Сериализованная страница каталога (body, etag) из кэша или из БД; ValueError — плохой курсор"""
+    key = ("list", limit, cursor, sort, status, min_price, max_price, in_stock)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        version = catalog_cache.version
+        items, next_cursor = await AsyncProductRepository.get_page(
+            db, limit=limit, cursor=cursor, sort=sort, status=status,
+            min_price=min_price, max_price=max_price, in_stock=in_stock,
+        )
+        body = ProductPage.model_validate({"items": items, "next_cursor": next_cursor}).model_dump_json().encode()
+        cached = (body, make_etag(body))
+        catalog_cache.set(key, cached, version)
+    return cached
+
+@router.get("/", response_model=ProductPage)
+async def list_products(
+    request: Request,
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: Literal["id", "price"] = "id",
+    status: Optional[ProductStatus] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        cached = await catalog_page(db, limit, cursor, sort, status, min_price, max_price, in_stock)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(request, *cached)
+
+@router.get("/search", response_model=ProductPage)
+async def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Поиск по названию, описанию и уходу с учетом опечаток; по убыванию релевантности"""
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    key = ("search", q.lower(), limit, cursor)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        version = catalog_cache.version
+        try:
+            items, next_cursor = await AsyncProductRepository.search(db, q, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body = ProductPage.model_validate({"items": items, "next_cursor": next_cursor}).model_dump_json().encode()
+        cached = (body, make_etag(body))
+        catalog_cache.set(key, cached, version)
+    return json_response(request, *cached)
 
 @router.get("/{product_id}", response_model=ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = ProductRepository.get_by_id(db, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    key = ("product", product_id)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        version = catalog_cache.version
+        product = await AsyncProductRepository.get_by_id(db, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = ProductOut.model_validate(product).model_dump_json().encode()
+        cached = (body, make_etag(body))
+        catalog_cache.set(key, cached, version)
+    return json_response(request, *cached)
 
 @router.post("/", response_model=ProductOut)
-def create_product(product: ProductCreate, db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    return ProductRepository.create(db, product)
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    created = await AsyncProductRepository.create(db, product)
+    note_write(admin.id, shared=True)
+    return created
 
 @router.put("/{product_id}", response_model=ProductOut)
-def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    updated = ProductRepository.update(db, product_id, product)
+async def update_product(product_id: int, product: ProductUpdate, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    updated = await AsyncProductRepository.update(db, product_id, product)
     if not updated:
         raise HTTPException(status_code=404, detail="Product not found")
+    note_write(admin.id, shared=True)
     return updated
 
 @router.delete("/{product_id}", response_model=ProductOut)
-def delete_product(product_id: int, db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    deleted = ProductRepository.delete(db, product_id)
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    deleted = await AsyncProductRepository.delete(db, product_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Product not found")
+    note_write(admin.id, shared=True)
     return deleted
\ No newline at end of file
@@ -1,26 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import file_cache, forget_file
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.core.dependencies import require_admin
-import os
-import uuid
+from app.core.etag import file_response
+from app.core.images import get_derivative, pregenerate, remove_derivatives, touch, touch_due, variant_width
+from app.core.storage import FileMeta, UploadTooLarge, describe, referenced_filenames, resolve, save_upload, sweep_orphans
 from pathlib import Path
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
-# Создаем папку для загруженных файлов
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 # Разрешенные типы файлов
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 
+# Запас на заголовки multipart сверх самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+FILE_CACHE_CONTROL = f"public, max-age={settings.FILE_MAX_AGE}, immutable"
+
 def is_allowed_file(filename: str) -> bool:
     """Проверяет, разрешен ли тип файла"""
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
 
+def too_large_error():
+    megabytes = settings.UPLOAD_MAX_BYTES // (1024 * 1024)
+    return HTTPException(status_code=400, detail=f"Файл слишком большой. Максимум {megabytes}MB")
+
+# Предел тела запроса загрузки; проверяется BodyLimitMiddleware по мере приема байтов
+UPLOAD_BODY_LIMIT = settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD
+
 @router.post("/image")
-async def upload_image(file: UploadFile = File(...), admin: bool = Depends(require_admin)):
-    """Загружает изображение и возвращает URL для доступа к нему"""
+async def upload_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    admin: bool = Depends(require_admin),
+):
+    """Загружает изображение и возвращает URL для доступа к нему.
+
+    Файл сохраняется под SHA-256 содержимого: повторная загрузка той же
+    картинки возвращает тот же URL и не занимает места.
+    """
     
     # Проверяем тип файла
     if not is_allowed_file(file.filename):
@@ -29,57 +51,112 @@ async def upload_image(file: UploadFile = File(...), admin: bool = Depends(requi
             detail="Неподдерживаемый тип файла. Разрешены: jpg, jpeg, png, gif, webp"
         )
     
-    # Проверяем размер файла (максимум 10MB)
-    file_content = await file.read()
-    if len(file_content) > 10 * 1024 * 1024:  # 10MB
-        raise HTTPException(status_code=400, detail="Файл слишком большой. Максимум 10MB")
-    
-    # Генерируем уникальное имя файла
-    file_extension = Path(file.filename).suffix.lower()
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-    
-    # Сохраняем файл
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
-        
-        # Возвращаем URL для доступа к файлу
-        file_url = f"/api/v1/upload/files/{unique_filename}"
-        return {
-            "filename": unique_filename,
-            "url": file_url,
-            "original_name": file.filename,
-            "size": len(file_content)
-        }
-    except Exception as e:
+        filename, size, created = await save_upload(
+            file, Path(file.filename).suffix.lower(), settings.UPLOAD_MAX_BYTES
+        )
+    except UploadTooLarge:
+        raise too_large_error()
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"Ошибка сохранения файла: {str(e)}")
 
-@router.get("/files/{filename}")
-async def get_file(filename: str):
-    """Возвращает загруженный файл"""
-    file_path = UPLOAD_DIR / filename
+    # Уменьшенные копии для каталога строим после ответа
+    if created:
+        background_tasks.add_task(pregenerate, resolve(filename))
     
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Файл не найден")
-    
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type="image/*"
-    )
+    # Возвращаем URL для доступа к файлу
+    return {
+        "filename": filename,
+        "url": f"/api/v1/upload/files/{filename}",
+        "original_name": file.filename,
+        "size": size,
+        "deduplicated": not created,
+    }
+
+async def _file_meta(filename: str, w: Optional[int], format: Optional[str], key) -> Optional[FileMeta]:
+    """Метаданные запрошенного файла или его копии; для горячих файлов — без обращения к диску"""
+    meta = file_cache.get(key)
+    if meta is not None:
+        return meta
+
+    version = file_cache.version
+    file_path = resolve(filename)
+    if file_path is None or not await run_in_threadpool(file_path.is_file):
+        return None
+
+    if w is not None or format is not None:
+        try:
+            derivative = await get_derivative(file_path, w, format)
+        except Exception:
+            # Не удалось декодировать картинку — отдаем оригинал
+            derivative = None
+        if derivative is not None:
+            file_path = derivative
+
+    try:
+        meta = await run_in_threadpool(describe, file_path)
+    except FileNotFoundError:
+        return None
+    file_cache.set(key, meta, version=version)
+    return meta
+
+@router.get("/files/{filename}")
+async def get_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    format: Optional[str] = Query(None, pattern="^(webp|jpg|png)$"),
+):
+    """Возвращает загруженный файл.
+
+    ?w=320 отдает уменьшенную копию (ширина округляется вверх до поддерживаемой),
+    ?format=webp — копию в WebP. Имена файлов не меняются при жизни файла,
+    поэтому ответ кэшируется клиентами и CDN бессрочно; поддерживаются
+    условные запросы и Range.
+    """
+    key = (filename, variant_width(w) if w else None, format)
+    # Вторая попытка — если копию вытеснили из кэша на диске после кэширования метаданных
+    for _ in range(2):
+        meta = await _file_meta(filename, w, format, key)
+        if meta is None:
+            break
+        response = await file_response(request, meta, FILE_CACHE_CONTROL)
+        if response is not None:
+            # Использование копии для вытеснения из кэша на диске — после ответа
+            if touch_due(meta.path):
+                background_tasks.add_task(touch, meta.path)
+            return response
+        file_cache.delete(key)
+
+    raise HTTPException(status_code=404, detail="Файл не найден")
 
 @router.delete("/files/{filename}")
-async def delete_file(filename: str, admin: bool = Depends(require_admin)):
-    """Удаляет загруженный файл"""
-    file_path = UPLOAD_DIR / filename
+async def delete_file(filename: str, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    """Удаляет загруженный файл, если на него больше не ссылается ни один товар"""
+    file_path = resolve(filename)
     
-    if not file_path.exists():
+    if file_path is None or not await run_in_threadpool(file_path.is_file):
         raise HTTPException(status_code=404, detail="Файл не найден")
+
+    # Одинаковые картинки хранятся одним файлом — он может быть нужен другому товару
+    if filename in await referenced_filenames(db):
+        raise HTTPException(status_code=409, detail="Файл используется в товарах")
     
     try:
-        file_path.unlink()
+        await run_in_threadpool(file_path.unlink)
+        await remove_derivatives(filename)
+        forget_file(filename)
         return {"message": "Файл успешно удален"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка удаления файла: {str(e)}")
 
+@router.post("/sweep")
+async def sweep_files(dry_run: bool = False, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    """Удаляет файлы, на которые не ссылается ни один товар"""
+    removed = await sweep_orphans(db, dry_run=dry_run)
+    if not dry_run:
+        for filename in removed:
+            await remove_derivatives(filename)
+            forget_file(filename)
+    return {"removed": removed, "dry_run": dry_run}
@@ -1,29 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.dependencies import get_current_user, require_admin
-from app.repositories.user_repo import UserRepository
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import principal_cache
+from app.core.database import get_async_db
+from app.core.dependencies import get_current_user, get_user_read_db, require_admin
+from app.core.replica import note_write
+from app.core.serialization import json_list_response
+from app.repositories.user_repo import AsyncUserRepository
 from app.schemas.user import UserOut, UserCreate, UserUpdate
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=UserOut)
-def get_current_user_info(current_user = Depends(get_current_user)):
+async def get_current_user_info(current_user = Depends(get_current_user)):
     return current_user
 
+@router.get("/auth-cache")
+async def get_auth_cache_stats(admin: bool = Depends(require_admin)):
+    return principal_cache.stats()
+
 @router.get("/", response_model=list[UserOut])
-def get_all_users(db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    return UserRepository.get_all(db)
+async def get_all_users(db: AsyncSession = Depends(get_user_read_db), admin: bool = Depends(require_admin)):
+    # email проверен при записи; повторная проверка EmailStr на выдаче — основная стоимость списка
+    return json_list_response(UserOut, await AsyncUserRepository.get_all_rows(db), trusted=True)
 
 @router.post("/", response_model=UserOut)
-def create_user(user: UserCreate, db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    if UserRepository.get_by_email(db, user.email):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    if await AsyncUserRepository.get_by_email(db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    return UserRepository.create(db, user)
+    created = await AsyncUserRepository.create(db, user)
+    note_write(admin.id)
+    return created
 
 @router.put("/{user_id}", response_model=UserOut)
-def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db), admin: bool = Depends(require_admin)):
-    updated = UserRepository.update(db, user_id, user)
+async def update_user(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_async_db), admin: bool = Depends(require_admin)):
+    updated = await AsyncUserRepository.update(db, user_id, user)
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
+    note_write(admin.id)
     return updated
\ No newline at end of file
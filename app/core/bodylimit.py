@@ -0,0 +1,68 @@
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+
+class BodyTooLarge(HTTPException):
+    """Тело запроса превысило предел; FastAPI пробрасывает HTTPException из разбора формы как есть"""
+
+    def __init__(self):
+        super().__init__(status_code=413, detail="Request body too large")
+
+
+class BodyLimitMiddleware:
+    """ASGI-middleware: предел размера тела для отдельных маршрутов.
+
+    FastAPI читает multipart-форму целиком (и пишет файлы во временные)
+    до зависимостей, включая авторизацию, поэтому проверка в обработчике
+    опаздывает. Здесь запрос с большим Content-Length отклоняется сразу,
+    а без него — как только принятые байты превысят предел.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        # (method, path) -> максимальный размер тела в байтах
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http":
+            limit = self.limits.get((scope["method"], scope["path"].rstrip("/")))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise BodyTooLarge()
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except BodyTooLarge:
+            # Обычно ответ 413 уже отправил обработчик исключений FastAPI
+            if response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    @staticmethod
+    async def _reject(scope, receive, send):
+        response = JSONResponse({"detail": "Request body too large"}, status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
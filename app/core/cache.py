@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from app.core.config import settings
+from app.core.metrics import cache_collector
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограничением размера и временем жизни записей.
+
+    Каждая инвалидация (``clear``, ``discard_where``) увеличивает ``version``:
+    запись, вычисленная до нее, не попадет в кэш, если передать в ``set``
+    старую версию.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> None:
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+            self.version += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.version += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "version": self.version,
+            }
+
+
+# Сериализованные ответы каталога: страницы списка и карточки товаров
+catalog_cache = TTLCache(maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL)
+cache_collector.register("catalog", catalog_cache)
+
+# Определения промокодов по имени (вместе с набором подходящих товаров)
+promo_cache = TTLCache(maxsize=settings.PROMO_CACHE_SIZE, ttl=settings.PROMO_CACHE_TTL)
+cache_collector.register("promo", promo_cache)
+
+# Проверенные JWT: токен -> снимок пользователя (id, email, роль)
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+cache_collector.register("principal", principal_cache)
+
+# Итоги корзин: (cart_id, версия корзины, версии каталога и промокодов) -> CartSummary
+cart_cache = TTLCache(maxsize=settings.CART_CACHE_SIZE, ttl=settings.CART_CACHE_TTL)
+cache_collector.register("cart", cart_cache)
+
+# Сохраненные ответы по Idempotency-Key: (user_id, ключ) -> IdempotencyRecord
+idempotency_cache = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_CACHE_TTL)
+cache_collector.register("idempotency", idempotency_cache)
+
+# Метаданные загруженных файлов: (имя, ширина, формат) -> FileMeta
+file_cache = TTLCache(maxsize=settings.FILE_CACHE_SIZE, ttl=settings.FILE_CACHE_TTL)
+cache_collector.register("files", file_cache)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Сбрасывает все закэшированные токены пользователя (смена роли, профиля)"""
+    principal_cache.discard_where(lambda principal: principal.id == user_id)
+
+
+def forget_file(filename: str) -> None:
+    """Сбрасывает метаданные файла и всех его уменьшенных копий"""
+    stem = filename.rsplit(".", 1)[0]
+    file_cache.discard_where(lambda meta: meta.path.name.startswith(stem))
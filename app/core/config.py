@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,6 +6,96 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     DATABASE_URL: str = "postgresql://admin:admin123@db:5432/dwcshop_db"
+
+    # bcrypt: стоимость хэша и отдельный пул процессов для него
+    BCRYPT_ROUNDS: int = 12
+    HASH_WORKERS: int = 2
+    HASH_MAX_PENDING: int = 32
+
+    # Пул соединений с БД (на каждый движок в каждом воркере)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+    # Соединения, открываемые при старте воркера (не больше DB_POOL_SIZE)
+    DB_POOL_WARM: int = 5
+
+    # Реплика для чтения (не задана — все читается с основной БД). Реплика
+    # используется, пока отвечает и отстает не больше REPLICA_MAX_LAG_SECONDS;
+    # пользователь после своей записи READ_YOUR_WRITES_SECONDS читает с основной
+    READ_REPLICA_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 2.0
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+
+    # Защита от перегрузки: запросов в минуту (и подряд) на IP или пользователя,
+    # хранилище корзин (memory — в воркере, database — общее) и предел
+    # одновременных запросов воркера (0 — без предела)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_LOGIN: int = 10
+    RATE_LIMIT_REGISTER: int = 5
+    RATE_LIMIT_CHECKOUT: int = 10
+    MAX_CONCURRENT_REQUESTS: int = 256
+
+    # Режим разработки: заголовок X-Query-Count и предупреждения в лог о повторах SQL
+    QUERY_DEBUG: bool = False
+    # Сколько одинаковых запросов за один HTTP-запрос считать признаком N+1
+    SQL_REPEAT_THRESHOLD: int = 3
+
+    # Быстрый путь (по желанию): списки в API кодируются в JSON напрямую через
+    # pydantic-core, минуя поэлементную проверку response_model (см. app/core/serialization.py)
+    FAST_JSON_RESPONSES: bool = False
+
+    # Загруженные изображения
+    UPLOAD_DIR: str = "uploads"
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_ORPHAN_GRACE_HOURS: int = 24
+
+    # Уменьшенные копии изображений: пул процессов и предел кэша на диске
+    IMAGE_WORKERS: int = 2
+    IMAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Кэш каталога товаров
+    CATALOG_CACHE_SIZE: int = 1024
+    CATALOG_CACHE_TTL: int = 60
+
+    # Кэш определений промокодов
+    PROMO_CACHE_SIZE: int = 1024
+    PROMO_CACHE_TTL: int = 60
+
+    # Кэш авторизованных пользователей (по токену)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60
+
+    # Кэш итогов корзин (ключ включает версию корзины, поэтому TTL может быть большим)
+    CART_CACHE_SIZE: int = 10000
+    CART_CACHE_TTL: int = 300
+
+    # Idempotency-Key при оформлении заказа: срок хранения ответа, через сколько
+    # секунд незавершенный запрос освобождает ключ, кэш ответов в памяти воркера
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 60
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_CACHE_TTL: int = 600
+
+    # Outbox: побочные эффекты оформления заказа выполняет фоновый обработчик —
+    # в каждом процессе API или отдельным процессом (python -m app.core.outbox,
+    # тогда здесь false). Повторы с экспоненциальной отсрочкой до OUTBOX_MAX_ATTEMPTS
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_BACKOFF_BASE: float = 1.0
+    OUTBOX_BACKOFF_MAX: float = 300.0
+
+    # Метаданные загруженных файлов (размер, mtime, MIME) и срок кэширования у клиентов
+    FILE_CACHE_SIZE: int = 4096
+    FILE_CACHE_TTL: int = 300
+    FILE_MAX_AGE: int = 365 * 24 * 3600
     
     class Config:
         env_file = ".env"
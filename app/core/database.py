@@ -1,17 +1,82 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.config import settings
+from app.core.metrics import instrument_engine, instrumented_pool
 
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://admin:admin123@db:5432/dwcshop_db")
+DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+# Асинхронные драйверы для синхронных URL из окружения
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str):
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+def engine_options(url, is_async: bool = False) -> dict:
+    """Параметры пула и таймаута запросов из Settings (только для PostgreSQL)"""
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+
+    timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if is_async:
+        connect_args = {"server_settings": {"statement_timeout": timeout}}
+    else:
+        connect_args = {"options": f"-c statement_timeout={timeout}"}
+
+    return {
+        "poolclass": instrumented_pool(AsyncAdaptedQueuePool if is_async else QueuePool),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+# Синхронный движок остается для скриптов (create_admin.py и т.п.)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Асинхронный движок для обработчиков API
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+# Реплика только для чтения (READ_REPLICA_URL); сессии выбирает app/core/replica.py
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.READ_REPLICA_URL:
+    REPLICA_ASYNC_URL = to_async_url(settings.READ_REPLICA_URL)
+    replica_engine = create_async_engine(REPLICA_ASYNC_URL, **engine_options(REPLICA_ASYNC_URL, is_async=True))
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    instrument_engine(replica_engine.sync_engine, "replica")
+
+def insert_for(db):
+    """insert() с поддержкой ON CONFLICT для диалекта сессии (PostgreSQL или SQLite)"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
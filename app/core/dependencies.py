@@ -1,18 +1,37 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import principal_cache
+from app.core.database import get_async_db
+from app.core.replica import read_session
 from app.core.config import settings
-from app.repositories.user_repo import UserRepository
+from app.models.user import UserRole
+from app.repositories.user_repo import AsyncUserRepository
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@dataclass(frozen=True)
+class Principal:
+    """Снимок авторизованного пользователя, который хранится в кэше вместо ORM-объекта"""
+    id: int
+    email: str
+    role: UserRole
+    first_name: Optional[str] = None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
+    version = principal_cache.version
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
@@ -21,12 +40,22 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = UserRepository.get_by_email(db, email=email)
+    user = await AsyncUserRepository.get_by_email(db, email=email)
     if user is None:
         raise credentials_exception
-    return user
 
-def require_admin(current_user = Depends(get_current_user)):
+    principal = Principal(id=user.id, email=user.email, role=user.role, first_name=user.first_name)
+    # Запись живет не дольше самого токена
+    expires_in = payload["exp"] - time.time() if "exp" in payload else None
+    principal_cache.set(token, principal, version, ttl=expires_in)
+    return principal
+
+async def require_admin(current_user = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_user_read_db(current_user = Depends(get_current_user)):
+    """Сессия для чтения данных пользователя: после его записи — с основной БД"""
+    async with read_session(current_user.id) as db:
+        yield db
@@ -0,0 +1,136 @@
+import hashlib
+import re
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import anyio
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+# Файлы меньше этого размера читаем целиком, остальные отдаем потоком
+FILE_CHUNK_SIZE = 64 * 1024
+
+BYTE_RANGE = re.compile(r"(\d*)-(\d*)")
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому ответа: одинаков во всех воркерах"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверяет If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def json_response(request: Request, body: bytes, etag: str, cache_control: str = "public, no-cache") -> Response:
+    """Отдает готовый JSON с ETag или 304, если клиентская копия актуальна"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def _byte_range(header: str, size: int) -> Optional[tuple]:
+    """Разбирает Range: bytes=a-b. None — заголовок игнорируем (чужая единица,
+    ошибка синтаксиса, несколько диапазонов — на них отвечаем целым файлом)"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    match = BYTE_RANGE.fullmatch(spec.strip())
+    if match is None or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start:
+        start, end = int(start), int(end) if end else size - 1
+        if start >= size:
+            raise RangeNotSatisfiable()
+        if end < start:
+            return None
+    else:
+        # bytes=-N: последние N байт
+        start, end = max(size - int(end), 0), size - 1
+        if end < start:
+            raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _not_modified_since(request: Request, meta) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or "if-none-match" in request.headers:
+        return False
+    try:
+        return int(meta.mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _range_applies(request: Request, meta) -> bool:
+    """If-Range: диапазон действует, только если у клиента та же версия файла"""
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range.strip() in (meta.etag, meta.last_modified)
+
+
+async def _stream(file, start: int, length: int):
+    try:
+        await file.seek(start)
+        while length > 0:
+            chunk = await file.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await file.aclose()
+
+
+async def file_response(request: Request, meta, cache_control: str) -> Optional[Response]:
+    """Отдает файл по метаданным (FileMeta) с учетом If-None-Match,
+    If-Modified-Since и Range. None — файл пропал с диска после кэширования метаданных.
+    """
+    headers = {
+        "ETag": meta.etag,
+        "Last-Modified": meta.last_modified,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request, meta.etag) or _not_modified_since(request, meta):
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, meta.size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header and _range_applies(request, meta):
+        try:
+            byte_range = _byte_range(range_header, meta.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{meta.size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{meta.size}"
+
+    length = end - start + 1
+    try:
+        file = await anyio.open_file(meta.path, "rb")
+    except FileNotFoundError:
+        return None
+
+    if length <= FILE_CHUNK_SIZE:
+        try:
+            await file.seek(start)
+            body = await file.read(length)
+        finally:
+            await file.aclose()
+        return Response(content=body, status_code=status_code, media_type=meta.media_type, headers=headers)
+
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(_stream(file, start, length), status_code=status_code, media_type=meta.media_type, headers=headers)
@@ -0,0 +1,90 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge, Histogram
+from app.core.config import settings
+from app.core.security import verify_password, get_password_hash
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Время операции bcrypt вместе с ожиданием в очереди пула",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending",
+    "Операции bcrypt в работе и в очереди",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Операции bcrypt, отклоненные из-за переполненной очереди",
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+class HashingBusy(HTTPException):
+    """Очередь bcrypt переполнена: отвечаем 503 сразу, а не копим ожидание"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: дочерний процесс импортирует только app.core.security
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def warm_executor() -> None:
+    """Запускает процессы пула заранее, чтобы первый вход не ждал их старта"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for _ in range(settings.HASH_WORKERS)))
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(operation: str, func, *args):
+    global _pending
+    if _pending >= settings.HASH_MAX_PENDING:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HashingBusy()
+
+    _pending += 1
+    PASSWORD_HASH_PENDING.set(_pending)
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        _pending -= 1
+        PASSWORD_HASH_PENDING.set(_pending)
+        PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run("verify", verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run("hash", get_password_hash, password)
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Tuple
+from fastapi import HTTPException, status
+from prometheus_client import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+from app.core.cache import idempotency_cache
+from app.core.config import settings
+from app.repositories.idempotency_repo import AsyncIdempotencyRepository, IdempotencyRecord
+
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total",
+    "Запросы с Idempotency-Key: executed — выполнены, replayed — ответ повторен, "
+    "in_progress — первый запрос еще выполняется, mismatch — ключ с другим телом",
+    ["result"],
+)
+
+# Доля запросов, после которых удаляются просроченные ключи
+PRUNE_PROBABILITY = 0.001
+
+# Запросы этого воркера, выполняющиеся прямо сейчас: (user_id, key) -> Future
+_in_flight = {}
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(record: IdempotencyRecord, request_hash: str) -> Response:
+    if record.request_hash != request_hash:
+        IDEMPOTENT_REQUESTS.labels("mismatch").inc()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    if record.status_code is None:
+        IDEMPOTENT_REQUESTS.labels("in_progress").inc()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "1"},
+        )
+    IDEMPOTENT_REQUESTS.labels("replayed").inc()
+    return Response(
+        record.response_body, status_code=record.status_code,
+        media_type="application/json", headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def run_once(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    payload,
+    handler: Callable[[Callable[[int, str], Awaitable[None]]], Awaitable[Tuple[int, str]]],
+) -> Response:
+    """Выполняет handler один раз на (пользователь, ключ) и повторяет его ответ.
+
+    handler возвращает (status_code, JSON-тело). Успешный handler передает
+    тот же ответ в полученную функцию complete до своего коммита — ответ
+    фиксируется одной транзакцией с результатом, и упавший после коммита
+    воркер не приведет к повторному выполнению. После ошибки (4xx,
+    исключение) ключ освобождается и повтор выполнится заново. Повтор, пришедший во время первого запроса, в этом
+    воркере ждет его завершения, в другом — получает 409 с Retry-After.
+    Ключ, чей запрос не завершился за IDEMPOTENCY_LOCK_TIMEOUT (упал воркер),
+    переходит следующему повтору.
+    """
+    cache_key = (user_id, key)
+    request_hash = fingerprint(payload)
+
+    while (pending := _in_flight.get(cache_key)) is not None:
+        await asyncio.shield(pending)
+
+    record = idempotency_cache.get(cache_key)
+    if record is not None:
+        return _replay(record, request_hash)
+
+    # Между проверкой и регистрацией нет await: повторы в этом воркере будут ждать
+    done = asyncio.get_running_loop().create_future()
+    _in_flight[cache_key] = done
+    claimed = False
+    try:
+        now = datetime.utcnow()
+        if random.random() < PRUNE_PROBABILITY:
+            await AsyncIdempotencyRepository.prune(db, now - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS))
+        record = await AsyncIdempotencyRepository.claim(
+            db, user_id, key, request_hash, now, now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        )
+        if record is not None:
+            if record.status_code is not None:
+                idempotency_cache.set(cache_key, record)
+            return _replay(record, request_hash)
+
+        claimed = True
+
+        async def complete(status_code: int, body: str):
+            await AsyncIdempotencyRepository.complete(db, user_id, key, status_code, body)
+
+        status_code, body = await handler(complete)
+        if status_code >= 400:
+            await db.rollback()
+            await AsyncIdempotencyRepository.release(db, user_id, key)
+        else:
+            idempotency_cache.set(cache_key, IdempotencyRecord(request_hash, status_code, body))
+        claimed = False
+        IDEMPOTENT_REQUESTS.labels("executed").inc()
+        return Response(body, status_code=status_code, media_type="application/json")
+    except Exception:
+        if claimed:
+            await db.rollback()
+            await AsyncIdempotencyRepository.release(db, user_id, key)
+        raise
+    finally:
+        del _in_flight[cache_key]
+        done.set_result(None)
@@ -0,0 +1,241 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from prometheus_client import Counter, Histogram
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.storage import UPLOAD_DIR
+
+IMAGE_DERIVATIVE_DURATION = Histogram(
+    "image_derivative_duration_seconds",
+    "Время построения уменьшенной копии изображения",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+IMAGE_DERIVATIVE_REQUESTS = Counter(
+    "image_derivative_requests_total",
+    "Запросы уменьшенных копий: hit — из кэша на диске, miss — построены заново",
+    ["result"],
+)
+
+# Кэш уменьшенных копий — служебная папка внутри хранилища
+DERIVATIVES_DIR = UPLOAD_DIR / ".derivatives"
+
+# Фиксированный набор ширин: произвольный ?w= округляется вверх до ближайшей
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+
+# Ширины, которые строим сразу после загрузки — плитки каталога и карточка товара
+PREGENERATE_WIDTHS = (320, 640)
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+# Форматы исходников, для которых строим копии (анимированный gif отдаем как есть)
+RESIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# mtime копии обновляется не чаще раза в столько секунд: для LRU этого хватает
+TOUCH_INTERVAL = 60
+
+_executor: Optional[ProcessPoolExecutor] = None
+_in_flight = {}
+_cache_bytes: Optional[int] = None
+# Копии, чей mtime обновлен недавно
+_recently_touched = TTLCache(maxsize=settings.FILE_CACHE_SIZE, ttl=TOUCH_INTERVAL)
+
+
+def prepare_cache() -> None:
+    DERIVATIVES_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: дочерний процесс импортирует только этот модуль и Pillow
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def variant_width(requested: int) -> int:
+    """Ближайшая поддерживаемая ширина не меньше запрошенной"""
+    for width in VARIANT_WIDTHS:
+        if width >= requested:
+            return width
+    return VARIANT_WIDTHS[-1]
+
+
+def default_format(source: Path) -> str:
+    extension = source.suffix.lower().lstrip(".")
+    return "jpg" if extension == "jpeg" else extension
+
+
+def derivative_path(source: Path, width: Optional[int], fmt: str) -> Path:
+    # Исходник назван по хэшу содержимого, значит и имя копии однозначно
+    return DERIVATIVES_DIR / f"{source.stem}_{width or 'full'}.{fmt}"
+
+
+def render(source: str, target: str, width: Optional[int], fmt: str) -> int:
+    """Строит копию шириной не больше width (без увеличения; None — в исходном
+    размере) и возвращает ее размер.
+
+    Выполняется в процессе пула; пишет во временный файл и атомарно переименовывает.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format = FORMATS[fmt][0]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if width and image.width > width:
+            image.thumbnail((width, width * image.height // image.width or 1), Image.LANCZOS)
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                image.save(temp, pil_format, quality=80, optimize=True)
+            os.replace(temp_path, target)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    return os.path.getsize(target)
+
+
+def _scan_cache() -> int:
+    return sum(path.stat().st_size for path in DERIVATIVES_DIR.iterdir() if path.is_file())
+
+
+def _evict(limit: int) -> int:
+    """Удаляет давно не запрошенные копии, пока кэш не уложится в limit"""
+    entries = []
+    for path in DERIVATIVES_DIR.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.is_file():
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    # Оставляем запас, чтобы не чистить кэш после каждой новой копии
+    target = limit * 0.9
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    return total
+
+
+def _touch(path: Path) -> bool:
+    """Отмечает использование копии (mtime служит меткой для LRU)"""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    _recently_touched.set(path, True)
+    return True
+
+
+def touch_due(path: Path) -> bool:
+    """Нужно ли отметить использование отданной копии.
+
+    Горячие копии отдаются по кэшу метаданных, минуя get_derivative, —
+    без отметки их mtime стареет и _evict удалял бы самые нужные.
+    """
+    if path.parent != DERIVATIVES_DIR or _recently_touched.get(path) is not None:
+        return False
+    # Отмечаем сразу: параллельные запросы не запустят еще одно обновление
+    _recently_touched.set(path, True)
+    return True
+
+
+async def touch(path: Path) -> None:
+    await run_in_threadpool(_touch, path)
+
+
+async def _account(size: int) -> None:
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = await run_in_threadpool(_scan_cache)
+    _cache_bytes += size
+    if _cache_bytes > settings.IMAGE_CACHE_MAX_BYTES:
+        _cache_bytes = await run_in_threadpool(_evict, settings.IMAGE_CACHE_MAX_BYTES)
+
+
+async def _generate(source: Path, target: Path, width: Optional[int], fmt: str) -> None:
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        size = await loop.run_in_executor(get_executor(), render, str(source), str(target), width, fmt)
+    finally:
+        IMAGE_DERIVATIVE_DURATION.observe(time.perf_counter() - start)
+    await _account(size)
+
+
+async def get_derivative(source: Path, width: Optional[int], fmt: Optional[str] = None) -> Optional[Path]:
+    """Путь к копии source нужной ширины и формата; строит ее при первом запросе.
+
+    width=None — перекодирование без уменьшения. Возвращает None, если для
+    этого исходника копии не строятся.
+    Одновременные промахи по одной копии ждут одного построения.
+    """
+    if source.suffix.lower() not in RESIZABLE_EXTENSIONS:
+        return None
+    fmt = fmt or default_format(source)
+    width = variant_width(width) if width else None
+    target = derivative_path(source, width, fmt)
+
+    if await run_in_threadpool(_touch, target):
+        IMAGE_DERIVATIVE_REQUESTS.labels("hit").inc()
+        return target
+
+    IMAGE_DERIVATIVE_REQUESTS.labels("miss").inc()
+    task = _in_flight.get(target)
+    if task is None:
+        task = asyncio.ensure_future(_generate(source, target, width, fmt))
+        _in_flight[target] = task
+        task.add_done_callback(lambda _: _in_flight.pop(target, None))
+    await asyncio.shield(task)
+    return target
+
+
+async def pregenerate(source: Path) -> None:
+    """Фоновое построение основных копий после загрузки; ошибки не критичны —
+    копию построит первый запрос"""
+    for width in PREGENERATE_WIDTHS:
+        for fmt in ("webp", None):
+            try:
+                await get_derivative(source, width, fmt)
+            except Exception:
+                return
+
+
+def _remove_derivatives(stem: str) -> None:
+    for path in DERIVATIVES_DIR.glob(f"{stem}_*"):
+        path.unlink(missing_ok=True)
+
+
+async def remove_derivatives(filename: str) -> None:
+    """Удаляет копии удаленного исходника"""
+    global _cache_bytes
+    await run_in_threadpool(_remove_derivatives, Path(filename).stem)
+    # Размер кэша пересчитаем при следующей записи
+    _cache_bytes = None
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import async_engine
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Готовность воркера принимать трафик: прогрев при старте завершен"""
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.warm_seconds: Optional[float] = None
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warm_seconds": self.warm_seconds,
+            "error": self.error,
+        }
+
+
+readiness = Readiness()
+
+
+async def warm_pool(size: Optional[int] = None) -> None:
+    """Открывает size соединений одновременно и возвращает их в пул.
+
+    Первый запрос воркера не платит за TCP/TLS, аутентификацию и загрузку
+    типов asyncpg.
+    """
+    size = min(size or settings.DB_POOL_WARM, settings.DB_POOL_SIZE)
+    results = await asyncio.gather(*(async_engine.connect() for _ in range(size)), return_exceptions=True)
+    # Открывшиеся соединения возвращаем в пул, даже если часть не открылась
+    connections = [result for result in results if not isinstance(result, BaseException)]
+    try:
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in connections))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+
+
+async def _ping() -> None:
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def ping_database(timeout: float = 1.0) -> bool:
+    # Таймаут и на получение соединения: при исчерпанном пуле или недоступной базе
+    # connect() ждал бы DB_POOL_TIMEOUT или таймаута TCP
+    try:
+        await asyncio.wait_for(_ping(), timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def warm_up(*steps: Callable[[], Awaitable]) -> None:
+    """Выполняет шаги прогрева, повторяя их, пока база недоступна.
+
+    Приложение стартует сразу; /readyz отвечает 503, пока прогрев не завершен.
+    """
+    delay = 0.5
+    while True:
+        try:
+            for step in steps:
+                await step()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            readiness.error = f"{type(e).__name__}: {e}"
+            logger.warning("Warm-up failed, retrying in %.1fs: %s", delay, readiness.error)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10.0)
+            continue
+
+        readiness.ready = True
+        readiness.error = None
+        readiness.warm_seconds = round(time.monotonic() - readiness.started_at, 3)
+        return
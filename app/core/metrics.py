@@ -0,0 +1,270 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+from prometheus_client import REGISTRY, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event, exc
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+)
+SQL_STATEMENTS = Counter(
+    "sql_statements_total",
+    "Количество SQL-запросов",
+    ["route"],
+)
+SQL_STATEMENT_DURATION = Histogram(
+    "sql_statement_duration_seconds",
+    "Время выполнения одного SQL-запроса",
+    ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SQL_STATEMENTS_PER_REQUEST = Histogram(
+    "sql_statements_per_request",
+    "Количество SQL-запросов на один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+SQL_REPEATED_STATEMENTS = Counter(
+    "sql_repeated_statements_total",
+    "HTTP-запросы, в которых один и тот же SQL выполнялся SQL_REPEAT_THRESHOLD и более раз (признак N+1)",
+    ["route"],
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула (включая открытие нового)",
+    ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Выдачи соединений из пула",
+    ["engine"],
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Запросы соединения, не дождавшиеся свободного места в пуле",
+    ["engine"],
+)
+
+# Маршрут для запросов вне HTTP (скрипты, фоновые задачи)
+NO_ROUTE = "-"
+
+
+@dataclass
+class RequestStats:
+    """SQL-статистика текущего HTTP-запроса; общая для всех сессий внутри него"""
+    statements: list = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int) -> dict:
+        """Одинаковые запросы, выполненные threshold и более раз: текст -> число.
+
+        Параметры передаются отдельно, поэтому загрузка связи в цикле дает
+        один и тот же текст запроса — типичный N+1.
+        """
+        counts = defaultdict(int)
+        for statement, _ in self.statements:
+            counts[statement] += 1
+        return {statement: n for statement, n in counts.items() if n >= threshold}
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+# Подписчики на завершенные HTTP-запросы: (метод и шаблон маршрута, RequestStats)
+_observers = []
+
+_engines = {}
+
+
+def instrumented_pool(pool_cls):
+    """Подкласс пула, который замеряет ожидание соединения"""
+
+    class InstrumentedPool(pool_cls):
+        def _do_get(self):
+            name = getattr(self, "_metrics_name", "default")
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                DB_POOL_TIMEOUTS.labels(name).inc()
+                raise
+            finally:
+                DB_POOL_CHECKOUT_WAIT.labels(name).observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_cls.__name__}"
+    return InstrumentedPool
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Подписывается на события движка: выдачи из пула и время каждого SQL-запроса"""
+    _engines[name] = engine
+    engine.pool._metrics_name = name
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.labels(name).inc()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Начало — на контексте выполнения: у упавшего запроса он просто уходит вместе с ним
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_start
+        stats = request_stats.get()
+        if stats is not None:
+            stats.statements.append((statement, duration))
+        else:
+            SQL_STATEMENTS.labels(NO_ROUTE).inc()
+            SQL_STATEMENT_DURATION.labels(NO_ROUTE).observe(duration)
+
+
+class PoolCollector:
+    """Текущее состояние пулов: размер, занятые и сверх лимита соединения"""
+
+    def collect(self):
+        size = GaugeMetricFamily("db_pool_size", "Размер пула соединений", labels=["engine"])
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Выданные соединения", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Соединения сверх pool_size", labels=["engine"])
+        for name, engine in _engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], pool.overflow())
+        yield size
+        yield checked_out
+        yield overflow
+
+
+class CacheCollector:
+    """Попадания и промахи in-process кэшей (TTLCache)"""
+
+    def __init__(self):
+        self.caches = {}
+
+    def register(self, name: str, cache) -> None:
+        self.caches[name] = cache
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Попадания в кэш", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Промахи кэша", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Записей в кэше", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+        yield hits
+        yield misses
+        yield size
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(PoolCollector())
+REGISTRY.register(cache_collector)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время ответа и SQL-запросы с разбивкой по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.QUERY_DEBUG:
+                    # Запросы, выполненные при потоковой отдаче тела, сюда не входят
+                    MutableHeaders(scope=message).append("X-Query-Count", str(stats.count))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            # Шаблон пути ("/api/v1/products/{product_id}") вместо самого пути
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - start)
+            SQL_STATEMENTS.labels(route).inc(stats.count)
+            SQL_STATEMENTS_PER_REQUEST.labels(route).observe(stats.count)
+            for _, duration in stats.statements:
+                SQL_STATEMENT_DURATION.labels(route).observe(duration)
+
+            repeated = stats.repeated(settings.SQL_REPEAT_THRESHOLD)
+            if repeated:
+                SQL_REPEATED_STATEMENTS.labels(route).inc()
+                if settings.QUERY_DEBUG:
+                    for statement, n in repeated.items():
+                        logger.warning("Possible N+1 in %s %s: %d× %s", scope["method"], route, n, statement)
+            for observer in _observers:
+                observer(f"{scope['method']} {route}", stats)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(limit: int, allow_repeats: bool = False):
+    """Проверка для тестов: каждый HTTP-запрос внутри блока выполняет не больше
+    limit SQL-запросов и не повторяет один запрос SQL_REPEAT_THRESHOLD раз.
+
+        with query_budget(2):
+            client.get("/api/v1/orders/", headers=auth)
+
+    Возвращает список (эндпоинт, RequestStats) для своих проверок.
+    """
+    captured = []
+
+    def observe(endpoint, stats):
+        captured.append((endpoint, stats))
+
+    _observers.append(observe)
+    try:
+        yield captured
+    finally:
+        _observers.remove(observe)
+
+    problems = []
+    for endpoint, stats in captured:
+        if stats.count > limit:
+            problems.append(f"{endpoint}: {stats.count} statements, budget {limit}")
+        if not allow_repeats:
+            for statement, n in stats.repeated(settings.SQL_REPEAT_THRESHOLD).items():
+                problems.append(f"{endpoint}: {n}× {statement}")
+    if problems:
+        raise QueryBudgetExceeded("\n".join(problems))
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
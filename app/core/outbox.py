@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from prometheus_client import Counter, Histogram
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.repositories.order_repo import AsyncOrderRepository
+from app.repositories.outbox_repo import ORDER_CREATED, ORDER_STATUS_CHANGED, AsyncOutboxRepository, ClaimedEvent
+from app.repositories.stats_repo import AsyncStatsRepository
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_EVENTS = Counter(
+    "outbox_events_total",
+    "События outbox: processed — обработаны, retried — отложены после ошибки, "
+    "dead — исчерпали OUTBOX_MAX_ATTEMPTS",
+    ["topic", "result"],
+)
+OUTBOX_DELAY = Histogram(
+    "outbox_event_delay_seconds",
+    "От записи события до успешной обработки",
+    ["topic"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0),
+)
+OUTBOX_HANDLER_DURATION = Histogram(
+    "outbox_handler_duration_seconds",
+    "Время обработки пачки событий одной темы",
+    ["topic"],
+)
+
+# Обработчик получает сессию и payload всех событий темы из пачки. Эффекты
+# в БД фиксируются одним коммитом с удалением событий — ровно один раз;
+# внешние эффекты (письма, вебхуки) — не менее одного раза, должны переносить повтор
+Handler = Callable[..., Awaitable[None]]
+
+HANDLERS: dict = {
+    ORDER_CREATED: [AsyncOrderRepository.record_preorders, AsyncStatsRepository.record_orders],
+    ORDER_STATUS_CHANGED: [AsyncStatsRepository.record_orders],
+}
+
+
+def register(topic: str, handler: Handler) -> None:
+    HANDLERS.setdefault(topic, []).append(handler)
+
+
+def backoff(attempts: int) -> float:
+    """Отсрочка после attempts-й неудачи: экспонента с потолком и случайным разбросом"""
+    delay = min(settings.OUTBOX_BACKOFF_MAX, settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxWorker:
+    """Разбирает outbox пачками: захват, обработка по темам, удаление или отсрочка.
+
+    Несколько воркеров (в каждом процессе API или отдельным процессом —
+    python -m app.core.outbox) работают параллельно: захват пропускает
+    заблокированные строки. Событие упавшего воркера возвращается в очередь
+    через OUTBOX_LEASE_SECONDS.
+    """
+
+    def __init__(self, handlers: Optional[dict] = None):
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def notify(self) -> None:
+        """Разбудить воркер сразу после коммита события, не дожидаясь опроса"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stop(self) -> None:
+        """Остановить цикл после текущей пачки: отмена посреди транзакции оставила бы соединение занятым"""
+        self._stopping = True
+        self.notify()
+
+    async def _handle(self, topic: str, events: list) -> None:
+        async with AsyncSessionLocal() as db:
+            with OUTBOX_HANDLER_DURATION.labels(topic).time():
+                for handler in self.handlers.get(topic, []):
+                    await handler(db, [event.payload for event in events])
+            await AsyncOutboxRepository.delete(db, [event.id for event in events])
+            await db.commit()
+
+        now = datetime.utcnow()
+        for event in events:
+            OUTBOX_DELAY.labels(topic).observe((now - event.created_at).total_seconds())
+        OUTBOX_EVENTS.labels(topic, "processed").inc(len(events))
+
+    async def _fail(self, event: ClaimedEvent, error: Exception) -> None:
+        message = f"{type(error).__name__}: {error}"
+        if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            OUTBOX_EVENTS.labels(event.topic, "dead").inc()
+            logger.error("Outbox event %s (%s) gave up after %s attempts: %s",
+                         event.id, event.topic, event.attempts, message)
+        else:
+            OUTBOX_EVENTS.labels(event.topic, "retried").inc()
+            logger.warning("Outbox event %s (%s) failed, attempt %s: %s",
+                           event.id, event.topic, event.attempts, message)
+        available_at = datetime.utcnow() + timedelta(seconds=backoff(event.attempts))
+        async with AsyncSessionLocal() as db:
+            await AsyncOutboxRepository.retry_later(db, event.id, available_at, message)
+
+    async def process_batch(self) -> int:
+        """Одна пачка; возвращает число захваченных событий"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            events = await AsyncOutboxRepository.claim(
+                db, settings.OUTBOX_BATCH_SIZE, now,
+                now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS), settings.OUTBOX_MAX_ATTEMPTS,
+            )
+
+        by_topic = defaultdict(list)
+        for event in events:
+            by_topic[event.topic].append(event)
+        for topic, topic_events in by_topic.items():
+            try:
+                await self._handle(topic, topic_events)
+                continue
+            except Exception as e:
+                if len(topic_events) == 1:
+                    await self._fail(topic_events[0], e)
+                    continue
+            # Пачка не прошла: по одному, чтобы одно плохое событие не держало остальные
+            for event in topic_events:
+                try:
+                    await self._handle(topic, [event])
+                except Exception as e:
+                    await self._fail(event, e)
+        return len(events)
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        delay = settings.OUTBOX_POLL_INTERVAL
+        while not self._stopping:
+            # Сброс до захвата: событие, записанное во время пачки, разбудит сразу
+            self._wakeup.clear()
+            try:
+                claimed = await self.process_batch()
+                delay = settings.OUTBOX_POLL_INTERVAL
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # База недоступна: повторяем реже, события никуда не денутся
+                claimed = 0
+                logger.warning("Outbox worker failed, retrying in %.1fs: %s", delay, e)
+                delay = min(delay * 2, 30.0)
+            if claimed >= settings.OUTBOX_BATCH_SIZE or self._stopping:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_worker = OutboxWorker()
+
+
+if __name__ == "__main__":
+    # Отдельный процесс-обработчик (в API тогда OUTBOX_WORKER_ENABLED=false)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(outbox_worker.run())
@@ -0,0 +1,20 @@
+import base64
+import json
+
+
+def encode_cursor(values: list) -> str:
+    """Упаковывает значения ключа сортировки последней строки в непрозрачный курсор"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Распаковывает курсор; ValueError, если он поврежден или не той длины"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
@@ -0,0 +1,209 @@
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from jose import JWTError, jwt
+from prometheus_client import Counter, Gauge
+from sqlalchemy import case, delete
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.responses import JSONResponse
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, insert_for
+from app.models.rate_limit import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total",
+    "Запросы, отклоненные ограничителем частоты (429)",
+    ["rule"],
+)
+LOAD_SHED = Counter(
+    "load_shed_requests_total",
+    "Запросы, сброшенные из-за предела одновременных запросов (503)",
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Запросы, обрабатываемые воркером прямо сейчас",
+)
+
+# Служебные маршруты не ограничиваются: балансировщик и Prometheus должны видеть воркер
+EXEMPT_PATHS = {"/healthz", "/readyz", "/metrics"}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Корзина токенов: per_minute запросов в минуту с запасом burst подряд.
+
+    by_user — ключ по пользователю из проверенного токена (без него или с недействительным — по IP).
+    """
+    name: str
+    method: str
+    path: str
+    per_minute: int
+    burst: int
+    by_user: bool = False
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60
+
+
+def default_rules() -> list:
+    # Вход и регистрация — bcrypt, оформление — транзакция с блокировками товаров
+    return [
+        Rule("login", "POST", "/api/v1/auth/login", settings.RATE_LIMIT_LOGIN, settings.RATE_LIMIT_LOGIN),
+        Rule("register", "POST", "/api/v1/auth/register", settings.RATE_LIMIT_REGISTER, settings.RATE_LIMIT_REGISTER),
+        Rule("checkout", "POST", "/api/v1/orders", settings.RATE_LIMIT_CHECKOUT, settings.RATE_LIMIT_CHECKOUT, by_user=True),
+    ]
+
+
+class MemoryBackend:
+    """Корзины в памяти воркера: лимит действует на каждый воркер отдельно"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Берет токен; 0 — запрос разрешен, иначе через сколько секунд появится токен"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        # Давно не встречавшиеся ключи вытесняются первыми
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def _take_statement(db, key: str, rate: float, burst: int, now: float):
+    """Атомарный UPSERT корзины: пополнение, списание и результат — в одном запросе"""
+    burst = float(burst)
+    refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * rate
+    refilled = case((refilled > burst, burst), else_=refilled)
+    allowed = refilled >= 1
+    stmt = insert_for(db)(RateLimitBucket).values(key=key, tokens=burst - 1, updated_at=now, allowed=True)
+    return stmt.on_conflict_do_update(
+        index_elements=[RateLimitBucket.key],
+        set_={
+            "tokens": case((allowed, refilled - 1), else_=refilled),
+            "updated_at": now,
+            "allowed": allowed,
+        },
+    ).returning(RateLimitBucket.tokens, RateLimitBucket.allowed)
+
+
+class DatabaseBackend:
+    """Корзины в таблице rate_limit_buckets: общий лимит для всех воркеров и реплик.
+
+    Один UPSERT на запрос. Локально ту же роль играет SQLite. При ошибке базы
+    запрос пропускается: ограничитель не должен ронять вход вместе с базой.
+    """
+
+    # Доля обращений, после которых удаляются давно не использованные корзины
+    PRUNE_PROBABILITY = 0.001
+    PRUNE_AFTER_SECONDS = 3600
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.time()
+        try:
+            async with AsyncSessionLocal() as db:
+                tokens, allowed = (await db.execute(_take_statement(db, key, rate, burst, now))).one()
+                if random.random() < self.PRUNE_PROBABILITY:
+                    await db.execute(delete(RateLimitBucket).where(
+                        RateLimitBucket.updated_at < now - self.PRUNE_AFTER_SECONDS
+                    ))
+                await db.commit()
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("Rate limit backend unavailable, allowing request: %s", e)
+            return 0.0
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+# Общие хранилища подключаются сюда по имени из RATE_LIMIT_BACKEND
+BACKENDS = {
+    "memory": MemoryBackend,
+    "database": DatabaseBackend,
+}
+
+
+def _token_subject(headers: dict) -> Optional[str]:
+    """Пользователь из Bearer-токена для ключа лимита; None — токена нет или он недействителен.
+
+    Подпись проверяется: иначе токен с чужим sub расходовал бы лимит жертвы.
+    """
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """ASGI-middleware: предел одновременных запросов воркера и лимиты частоты по правилам.
+
+    Сверх MAX_CONCURRENT_REQUESTS запрос сразу получает 503 вместо ожидания
+    в очереди — задержка остальных остается ограниченной. Превышение лимита
+    правила — 429. В обоих случаях Retry-After подсказывает, когда повторить.
+    IP клиента берется из scope: за прокси запускайте uvicorn с --proxy-headers.
+    """
+
+    def __init__(self, app, rules: Optional[list] = None, backend=None):
+        self.app = app
+        self.rules = {(rule.method, rule.path): rule for rule in (rules if rules is not None else default_rules())}
+        self.backend = backend or BACKENDS[settings.RATE_LIMIT_BACKEND]()
+        self.in_flight = 0
+
+    def _key(self, rule: Rule, scope) -> str:
+        if rule.by_user:
+            subject = _token_subject(dict(scope["headers"]))
+            if subject:
+                return f"{rule.name}:user:{subject}"
+        client = scope.get("client")
+        return f"{rule.name}:ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.MAX_CONCURRENT_REQUESTS
+        if limit and self.in_flight >= limit:
+            LOAD_SHED.inc()
+            await _reject(503, "Server is overloaded, try again later", 1)(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        IN_FLIGHT.set(self.in_flight)
+        try:
+            rule = self.rules.get((scope["method"], scope["path"].rstrip("/")))
+            if rule is not None and settings.RATE_LIMIT_ENABLED:
+                wait = await self.backend.take(self._key(rule, scope), rule.rate, rule.burst)
+                if wait > 0:
+                    RATE_LIMITED.labels(rule.name).inc()
+                    await _reject(429, "Too many requests", wait)(scope, receive, send)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight)
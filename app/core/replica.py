@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from typing import Optional
+from prometheus_client import Counter, Gauge
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, ReplicaSessionLocal, replica_engine
+
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Отставание реплики при последней проверке",
+)
+REPLICA_USABLE = Gauge(
+    "db_replica_usable",
+    "1 — чтения идут на реплику, 0 — на основную БД",
+)
+READ_ROUTED = Counter(
+    "db_read_sessions_total",
+    "Сессии для чтения по месту выполнения: replica — реплика, primary — основная БД "
+    "(реплики нет, она недоступна или отстает), read_your_writes — основная БД после записи",
+    ["target"],
+)
+
+# Отставание реплики PostgreSQL в секундах. Если все полученное уже применено,
+# отставание 0: иначе на простаивающей основной БД оно росло бы само по себе.
+# Не реплика (pg_is_in_recovery() = false) — тоже 0
+LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class ReplicaMonitor:
+    """Состояние реплики по периодическим проверкам отставания.
+
+    Без свежей успешной проверки (старт воркера, зависшая проверка) реплика
+    считается непригодной: лучше лишняя нагрузка на основную БД, чем устаревшие данные.
+    """
+
+    def __init__(self):
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+
+    def usable(self) -> bool:
+        fresh = time.monotonic() - self.checked_at < 3 * settings.REPLICA_CHECK_INTERVAL
+        return self.healthy and fresh and self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    def status(self) -> dict:
+        return {"usable": self.usable(), "lag_seconds": self.lag, "error": self.error}
+
+    def mark_failed(self, error: Exception) -> None:
+        """Ошибка соединения в запросе: до следующей проверки читаем с основной БД"""
+        if self.healthy:
+            logger.warning("Read replica failed, falling back to primary: %s", error)
+        self.healthy = False
+        self.error = f"{type(error).__name__}: {error}"
+        REPLICA_USABLE.set(0)
+
+    async def check(self, timeout: float = 1.0) -> None:
+        try:
+            async with replica_engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    lag = await asyncio.wait_for(connection.scalar(LAG_QUERY), timeout)
+                else:
+                    # Локальная разработка: «реплика» — та же БД SQLite
+                    await asyncio.wait_for(connection.execute(text("SELECT 1")), timeout)
+                    lag = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.mark_failed(e)
+            return
+
+        self.lag = float(lag)
+        self.healthy = True
+        self.error = None
+        self.checked_at = time.monotonic()
+        REPLICA_LAG.set(self.lag)
+        REPLICA_USABLE.set(1 if self.usable() else 0)
+        if not self.usable():
+            logger.warning("Read replica lags %.1fs, reading from primary", self.lag)
+
+    async def run(self) -> None:
+        """Фоновая проверка каждые REPLICA_CHECK_INTERVAL секунд (задача в lifespan)"""
+        while True:
+            await self.check()
+            await asyncio.sleep(settings.REPLICA_CHECK_INTERVAL)
+
+
+replica_monitor = ReplicaMonitor()
+
+# Пользователи, которые недавно писали: их чтения идут на основную БД,
+# пока реплика могла еще не получить запись (в пределах воркера)
+recent_writers = TTLCache(maxsize=100000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+# Запасной путь для анонимных клиентов и запросов, попавших в другой воркер:
+# время последней записи клиента в cookie
+WRITE_COOKIE = "last_write"
+
+# До какого момента (monotonic) все чтения воркера идут на основную БД:
+# после изменения каталога кэш не должен заново наполниться старыми данными с реплики
+_primary_until = 0.0
+
+
+@dataclass
+class ClientWrites:
+    """Записи клиента текущего HTTP-запроса: last_write из cookie (unix time) и запись в этом запросе"""
+    last_write: Optional[float] = None
+    wrote: bool = False
+
+
+# Объект, а не значение: запись в обработчике видна middleware, даже если
+# обработчик выполняется в другой задаче с копией контекста
+client_writes: ContextVar[Optional[ClientWrites]] = ContextVar("client_writes", default=None)
+
+
+def note_write(user_id: Optional[int] = None, shared: bool = False) -> None:
+    """Отмечает запись пользователя user_id (и текущего клиента — через cookie);
+    shared — общих данных (каталог), для всего воркера"""
+    global _primary_until
+    if ReplicaSessionLocal is None:
+        return
+    if user_id is not None:
+        recent_writers.set(user_id, True)
+    if shared:
+        _primary_until = time.monotonic() + settings.READ_YOUR_WRITES_SECONDS
+    writes = client_writes.get()
+    if writes is not None:
+        writes.wrote = True
+
+
+def _wrote_recently(writes: Optional[ClientWrites]) -> bool:
+    if writes is None:
+        return False
+    if writes.wrote:
+        return True
+    # Время из будущего (подделка, расхождение часов) не учитываем
+    now = time.time()
+    return writes.last_write is not None and now - settings.READ_YOUR_WRITES_SECONDS < writes.last_write <= now + 1
+
+
+def read_target(user_id: Optional[int] = None) -> str:
+    if ReplicaSessionLocal is None or not replica_monitor.usable():
+        return "primary"
+    if time.monotonic() < _primary_until:
+        return "read_your_writes"
+    if user_id is not None and recent_writers.get(user_id):
+        return "read_your_writes"
+    if _wrote_recently(client_writes.get()):
+        return "read_your_writes"
+    return "replica"
+
+
+@asynccontextmanager
+async def read_session(user_id: Optional[int] = None):
+    """Сессия для чтения: реплика, если она пригодна и пользователь (клиент) недавно не писал"""
+    target = read_target(user_id)
+    READ_ROUTED.labels(target).inc()
+    if target != "replica":
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    async with ReplicaSessionLocal() as db:
+        try:
+            yield db
+        except (OperationalError, InterfaceError, OSError) as e:
+            # Реплика недоступна: следующие запросы — на основную БД до успешной проверки
+            replica_monitor.mark_failed(e)
+            raise
+
+
+async def get_read_db():
+    """Зависимость для обработчиков только на чтение без привязки к пользователю"""
+    async with read_session() as db:
+        yield db
+
+
+def _cookie_value(headers: list) -> Optional[float]:
+    for name, value in headers:
+        if name != b"cookie":
+            continue
+        morsel = SimpleCookie(value.decode("latin-1")).get(WRITE_COOKIE)
+        if morsel is not None:
+            try:
+                return float(morsel.value)
+            except ValueError:
+                return None
+    return None
+
+
+class ReadYourWritesMiddleware:
+    """ASGI-middleware: читает cookie последней записи и ставит ее, если запрос писал.
+
+    Cookie живет READ_YOUR_WRITES_SECONDS; пока она есть, чтения клиента идут
+    на основную БД в любом воркере.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or ReplicaSessionLocal is None:
+            await self.app(scope, receive, send)
+            return
+
+        writes = ClientWrites(last_write=_cookie_value(scope["headers"]))
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and writes.wrote:
+                cookie = SimpleCookie()
+                cookie[WRITE_COOKIE] = f"{time.time():.3f}"
+                cookie[WRITE_COOKIE].update({
+                    "max-age": int(settings.READ_YOUR_WRITES_SECONDS) or 1,
+                    "path": "/", "httponly": True, "samesite": "lax",
+                })
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.output(header="").strip().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = client_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            client_writes.reset(token)
@@ -0,0 +1,112 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+# Вес совпадения по полю — как setweight A/B/C в PostgreSQL (ts_rank: 1.0, 0.4, 0.2)
+FIELD_WEIGHTS = {"name": 1.0, "description": 0.4, "care": 0.2}
+
+# Порог похожести слов по триграммам — как pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> list:
+    if not text:
+        return []
+    return TOKEN.findall(text.lower().replace("ё", "е"))
+
+
+def trigrams(word: str) -> set:
+    """Триграммы слова с отступами, как в pg_trgm"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """In-memory индекс товаров для баз без полнотекстового поиска (SQLite).
+
+    Инвертированный индекс слово -> {product_id: вес} и триграммный индекс
+    по словарю для поиска с опечатками. Ранжирует примерно как PostgreSQL:
+    все слова запроса должны совпасть (точно, по префиксу или по похожести),
+    вклад слова — вес поля, умноженный на похожесть.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.built_at = 0.0
+        self._postings = {}
+        self._vocabulary = {}
+        self._lock = threading.Lock()
+
+    def is_stale(self, version: int, ttl: float) -> bool:
+        return self.version != version or time.monotonic() - self.built_at > ttl
+
+    def build(self, rows, version: int) -> None:
+        """rows — (id, name, description, care)"""
+        postings = defaultdict(lambda: defaultdict(float))
+        for product_id, *fields in rows:
+            for field, text in zip(FIELD_WEIGHTS, fields):
+                weight = FIELD_WEIGHTS[field]
+                for word in set(tokenize(text)):
+                    posting = postings[word]
+                    posting[product_id] = max(posting[product_id], weight)
+
+        vocabulary = defaultdict(set)
+        for word in postings:
+            for trigram in trigrams(word):
+                vocabulary[trigram].add(word)
+
+        with self._lock:
+            self._postings = {word: dict(posting) for word, posting in postings.items()}
+            self._vocabulary = dict(vocabulary)
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def _similar_words(self, token: str) -> dict:
+        """Слова словаря, похожие на token: слово -> похожесть (0..1]"""
+        query_trigrams = trigrams(token)
+        common = defaultdict(int)
+        for trigram in query_trigrams:
+            for word in self._vocabulary.get(trigram, ()):
+                common[word] += 1
+
+        matches = {}
+        for word, shared in common.items():
+            if word == token:
+                matches[word] = 1.0
+            elif word.startswith(token):
+                # Префикс: "футб" находит "футболка"
+                matches[word] = 0.9
+            else:
+                similarity = shared / len(query_trigrams | trigrams(word))
+                if similarity >= SIMILARITY_THRESHOLD:
+                    matches[word] = similarity
+        return matches
+
+    def search(self, query: str) -> list:
+        """[(score, product_id)] по убыванию (score, id)"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            scores = None
+            for token in tokens:
+                token_scores = defaultdict(float)
+                for word, similarity in self._similar_words(token).items():
+                    for product_id, weight in self._postings[word].items():
+                        token_scores[product_id] = max(token_scores[product_id], weight * similarity)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pid: score + token_scores[pid] for pid, score in scores.items() if pid in token_scores}
+                if not scores:
+                    return []
+
+        return sorted(((score, pid) for pid, score in scores.items()), reverse=True)
+
+
+search_index = SearchIndex()
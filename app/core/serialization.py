@@ -0,0 +1,35 @@
+from functools import lru_cache
+from typing import List, Type
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from app.core.config import settings
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter для списка схем; строится один раз на схему"""
+    return TypeAdapter(List[model])
+
+
+def dump_list(model: Type[BaseModel], rows, trusted: bool = False) -> bytes:
+    """Проверяет весь список одним вызовом pydantic-core и сразу кодирует в JSON.
+
+    rows — ORM-объекты, строки Row или словари. trusted=True — строки плоской
+    схемы из собственной БД: проверка пропускается (model_construct), что
+    важно для дорогих валидаторов вроде EmailStr.
+    """
+    adapter = list_adapter(model)
+    if trusted:
+        return adapter.dump_json([model.model_construct(**row._mapping) for row in rows])
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def json_list_response(model: Type[BaseModel], rows, trusted: bool = False):
+    """Готовый JSON-ответ со списком; минует поэлементную проверку response_model
+    и jsonable_encoder + json.dumps в FastAPI.
+
+    При FAST_JSON_RESPONSES=False возвращает rows как есть (обычный путь FastAPI).
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return rows
+    return Response(content=dump_list(model, rows, trusted), media_type="application/json")
@@ -0,0 +1,153 @@
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional
+from fastapi import UploadFile
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.models.product import Product
+
+UPLOAD_DIR = Path(settings.UPLOAD_DIR)
+
+# Недокачанные файлы лежат рядом, чтобы переименование было атомарным
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+
+CHUNK_SIZE = 256 * 1024
+
+# Одинаковые форматы под одним расширением, чтобы дубликаты совпадали по имени
+EXTENSION_ALIASES = {".jpeg": ".jpg"}
+
+# В минимальных образах системная база MIME-типов может не знать webp
+mimetypes.add_type("image/webp", ".webp")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class FileMeta:
+    """То, что нужно для ответа файлом без обращения к диску"""
+    path: Path
+    size: int
+    mtime: float
+    etag: str
+    last_modified: str
+    media_type: str
+
+
+def describe(path: Path) -> FileMeta:
+    """Снимает метаданные файла (блокирующий вызов)"""
+    stat = path.stat()
+    # Имена производные от содержимого, поэтому годятся в качестве ETag
+    return FileMeta(
+        path=path,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        etag=f'"{path.name}"',
+        last_modified=formatdate(stat.st_mtime, usegmt=True),
+        media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+    )
+
+
+def prepare_storage() -> None:
+    """Создает папки хранилища (при старте приложения, не при импорте)"""
+    UPLOAD_DIR.mkdir(exist_ok=True)
+    INCOMING_DIR.mkdir(exist_ok=True)
+
+
+def resolve(filename: str) -> Optional[Path]:
+    """Путь к файлу в хранилище; None для имен с путями и служебных файлов"""
+    if not filename or filename != Path(filename).name or filename.startswith("."):
+        return None
+    return UPLOAD_DIR / filename
+
+
+def _finalize(temp_path: str, target: Path) -> bool:
+    """Переносит файл на место; False, если такой же файл уже был (дедупликация)"""
+    if target.exists():
+        try:
+            # Свежий mtime: очистка сирот не удалит файл, пока товар с ним еще не сохранен
+            os.utime(target)
+        except FileNotFoundError:
+            # Очистка успела удалить файл — кладем загруженный
+            os.replace(temp_path, target)
+            return True
+        os.unlink(temp_path)
+        return False
+    os.replace(temp_path, target)
+    return True
+
+
+async def save_upload(file: UploadFile, extension: str, max_bytes: int):
+    """Пишет загрузку во временный файл по частям, считая размер и SHA-256,
+    и сохраняет ее под именем-хэшем. Возвращает (filename, size, created).
+
+    Все операции с диском выполняются вне цикла событий.
+    """
+    extension = EXTENSION_ALIASES.get(extension, extension)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, temp_path = await run_in_threadpool(tempfile.mkstemp, dir=INCOMING_DIR)
+    temp = os.fdopen(fd, "wb")
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge()
+            digest.update(chunk)
+            await run_in_threadpool(temp.write, chunk)
+        await run_in_threadpool(temp.close)
+    except BaseException:
+        temp.close()
+        await run_in_threadpool(os.unlink, temp_path)
+        raise
+
+    filename = f"{digest.hexdigest()}{extension}"
+    created = await run_in_threadpool(_finalize, temp_path, UPLOAD_DIR / filename)
+    return filename, size, created
+
+
+def _referenced_name(value: Optional[str]) -> Optional[str]:
+    # В товарах хранятся и полные URL (/api/v1/upload/files/<name>), и голые имена
+    return value.rsplit("/", 1)[-1] if value else None
+
+
+async def referenced_filenames(db) -> set:
+    """Имена файлов, на которые ссылаются превью и галереи товаров"""
+    names = set()
+    result = await db.stream(select(Product.preview, Product.images).execution_options(yield_per=1000))
+    async for preview, images in result:
+        names.add(_referenced_name(preview))
+        names.update(_referenced_name(image) for image in images or [])
+    names.discard(None)
+    return names
+
+
+def _sweep(referenced: set, grace_seconds: float, dry_run: bool) -> list:
+    cutoff = time.time() - grace_seconds
+    removed = []
+    for path in list(UPLOAD_DIR.iterdir()) + list(INCOMING_DIR.iterdir()):
+        if not path.is_file() or path.name in referenced:
+            continue
+        # Свежие файлы могли загрузить для товара, который еще не сохранен
+        if path.stat().st_mtime > cutoff:
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        removed.append(path.name)
+    return removed
+
+
+async def sweep_orphans(db, dry_run: bool = False) -> list:
+    """Удаляет файлы без ссылок из товаров, старше UPLOAD_ORPHAN_GRACE_HOURS"""
+    referenced = await referenced_filenames(db)
+    grace_seconds = settings.UPLOAD_ORPHAN_GRACE_HOURS * 3600
+    return await run_in_threadpool(_sweep, referenced, grace_seconds, dry_run)
@@ -1,11 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.database import engine, Base
-from app.api.v1 import products, auth, users, cart, promo, orders, upload
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.database import AsyncSessionLocal, async_engine, replica_engine
+from app.core import hashing, images, lifecycle, storage
+from app.core.bodylimit import BodyLimitMiddleware
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, metrics_response
+from app.core.outbox import outbox_worker
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.replica import ReadYourWritesMiddleware, replica_monitor
+from app.api.v1 import products, auth, users, cart, promo, orders, upload, admin
+from app.repositories.promo_repo import AsyncPromoCodeRepository
 
-Base.metadata.create_all(bind=engine)
+async def warm_caches():
+    """Первая страница каталога и активные промокоды — в кэш до первого запроса"""
+    async with AsyncSessionLocal() as db:
+        await products.catalog_page(db)
+        await AsyncPromoCodeRepository.warm_definitions(db)
 
-app = FastAPI(title="GWC Store API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Схема БД — только миграциями (alembic upgrade head), не при старте
+    await run_in_threadpool(storage.prepare_storage)
+    await run_in_threadpool(images.prepare_cache)
+    warm_up = asyncio.create_task(
+        lifecycle.warm_up(lifecycle.warm_pool, warm_caches, hashing.warm_executor)
+    )
+    # Пока реплика не прошла проверку, чтения идут на основную БД
+    monitor = asyncio.create_task(replica_monitor.run()) if replica_engine is not None else None
+    outbox = asyncio.create_task(outbox_worker.run()) if settings.OUTBOX_WORKER_ENABLED else None
+    yield
+    warm_up.cancel()
+    if outbox is not None:
+        # Текущая пачка дописывается, затем движок можно закрывать
+        outbox_worker.stop()
+        try:
+            await asyncio.wait_for(outbox, timeout=10)
+        except asyncio.TimeoutError:
+            pass
+    if monitor is not None:
+        monitor.cancel()
+        await asyncio.gather(monitor, return_exceptions=True)
+        await replica_engine.dispose()
+    hashing.shutdown_executor()
+    images.shutdown_executor()
+    await async_engine.dispose()
+
+app = FastAPI(title="GWC Store API", version="1.0.0", lifespan=lifespan)
+
+# Cookie последней записи клиента: после своих изменений он читает с основной БД
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Размер тела загрузки — до разбора multipart-формы и авторизации
+app.add_middleware(BodyLimitMiddleware, limits={("POST", "/api/v1/upload/image"): upload.UPLOAD_BODY_LIMIT})
+
+# Лимиты частоты и предел одновременных запросов — внутри CORS, чтобы браузер
+# видел ответы 429/503
+app.add_middleware(RateLimitMiddleware)
 
 # Настройка CORS - ОБНОВЛЕННАЯ ВЕРСИЯ
 app.add_middleware(
@@ -19,8 +73,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Разрешить все методы
     allow_headers=["*"],  # Разрешить все заголовки
+    expose_headers=["X-Query-Count", "Retry-After", "Idempotent-Replayed"],  # Доступны JS фронтенда
 )
 
+# Время ответов и SQL-запросы по маршрутам для /metrics
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(products.router, prefix="/api/v1")
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
@@ -28,7 +86,30 @@ app.include_router(cart.router, prefix="/api/v1")
 app.include_router(promo.router, prefix="/api/v1")
 app.include_router(orders.router, prefix="/api/v1")
 app.include_router(upload.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
-    return {"message": "GWC Store API"}
\ No newline at end of file
+    return {"message": "GWC Store API"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: процесс жив и обслуживает цикл событий"""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: прогрев завершен и база отвечает; иначе 503.
+
+    Реплика на готовность не влияет: без нее чтения идут на основную БД.
+    """
+    status = lifecycle.readiness.status()
+    status["database"] = await lifecycle.ping_database() if status["ready"] else False
+    if replica_engine is not None:
+        status["replica"] = replica_monitor.status()
+    ready = status["ready"] and status["database"]
+    return JSONResponse(status, status_code=200 if ready else 503)
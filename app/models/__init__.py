@@ -2,4 +2,8 @@ from .product import Product, ProductStatus
 from .user import User, UserRole
 from .promo import PromoCode, PromoApplicableProduct
 from .cart import Cart, CartItem
-from .order import Order, OrderItem, OrderStatus
\ No newline at end of file
+from .order import Order, OrderItem, OrderStatus
+from .rate_limit import RateLimitBucket
+from .idempotency import IdempotencyKey
+from .outbox import OutboxEvent
+from .stats import SalesDaily, ProductSales, PromoDaily
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -8,11 +8,18 @@ class Cart(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     promo_code_id = Column(Integer, ForeignKey("promo_codes.id"), nullable=True)
+    # Растет при каждом изменении позиций и промокода — ключ кэша итогов корзины
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     
     user = relationship("User")
     promo_code = relationship("PromoCode")
     items = relationship("CartItem", cascade="all, delete-orphan")
 
+    # Одна корзина на пользователя: цель для INSERT ... ON CONFLICT (user_id)
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_carts_user_id"),
+    )
+
 class CartItem(Base):
     __tablename__ = "cart_items"
 
@@ -21,4 +28,10 @@ class CartItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, default=1)
     
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+
+    # Одна строка на товар в корзине: цель для INSERT ... ON CONFLICT.
+    # Индекс ограничения начинается с cart_id и обслуживает загрузку корзины.
+    __table_args__ = (
+        UniqueConstraint("cart_id", "product_id", name="uq_cart_items_cart_id_product_id"),
+    )
\ No newline at end of file
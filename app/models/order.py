@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, Enum, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, Float, String, Enum, DateTime, ForeignKey, Index, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -24,16 +24,30 @@ class Order(Base):
     customer_phone = Column(String)
     customer_email = Column(String)
     delivery_address = Column(String)
+    # Заказ входит в сводки продаж (app/models/stats.py): обработчик сводок
+    # приводит флаг к «статус не отменен» и применяет разницу
+    sales_counted = Column(Boolean, nullable=False, default=False, server_default=false())
     
     user = relationship("User")
     promo_code = relationship("PromoCode")
     items = relationship("OrderItem", cascade="all, delete-orphan")
 
+    # created_at читается через RETURNING при вставке, без отдельного SELECT
+    __mapper_args__ = {"eager_defaults": True}
+
+    # Keyset-пагинация админского списка: (created_at, id), в том числе по статусу;
+    # история заказов пользователя: (user_id, created_at)
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
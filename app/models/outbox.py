@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from app.core.database import Base
+
+class OutboxEvent(Base):
+    """Побочный эффект, записанный в одной транзакции с изменением (transactional outbox).
+
+    Обрабатывается фоновым воркером (app/core/outbox.py) и удаляется после
+    успешной обработки. available_at — когда событие можно взять: при захвате
+    сдвигается на OUTBOX_LEASE_SECONDS вперед, после ошибки — на время отсрочки.
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    # Число захватов; при OUTBOX_MAX_ATTEMPTS событие остается в таблице для разбора
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_events_available_at", "available_at"),
+    )
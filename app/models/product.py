@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Enum, ARRAY
+from sqlalchemy import Column, Integer, String, Float, Enum, ARRAY, JSON, Index, DDL, event, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import enum
@@ -8,6 +8,15 @@ class ProductStatus(str, enum.Enum):
     preorder = "preorder"
     waiting = "waiting"
 
+# Документ полнотекстового поиска (PostgreSQL): имя важнее описания, описание — ухода.
+# Тот же текст используется в запросе, иначе планировщик не возьмет индекс.
+SEARCH_CONFIG = "russian"
+SEARCH_DOCUMENT = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(care, '')), 'C')"
+)
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -20,4 +29,26 @@ class Product(Base):
     stock = Column(Integer, default=0)
     preorder_count = Column(Integer, default=0)
     preview = Column(String)
-    images = Column(ARRAY(String), default=[])
\ No newline at end of file
+    # SQLite (тесты, нагрузочный прогон in-process) — JSON, как в миграции 0001
+    images = Column(ARRAY(String).with_variant(JSON(), "sqlite"), default=[])
+
+    # Индексы под keyset-пагинацию каталога: (price, id) и (id) с фильтрами
+    __table_args__ = (
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_status_id", "status", "id"),
+        Index("ix_products_status_price_id", "status", "price", "id"),
+        Index("ix_products_in_stock_id", "id", postgresql_where=stock > 0),
+        Index("ix_products_in_stock_price_id", "price", "id", postgresql_where=stock > 0),
+        # Поиск: GIN по tsvector и по триграммам имени (опечатки)
+        Index("ix_products_search", text(f"({SEARCH_DOCUMENT})"), postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_products_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+event.listen(
+    Product.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -10,7 +10,7 @@ class PromoCode(Base):
     discount = Column(Float, nullable=False)
     usage_limit = Column(Integer, default=1)
     usage_count = Column(Integer, default=0)
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, index=True)
     applies_to_all = Column(Boolean, default=True)
 
 class PromoApplicableProduct(Base):
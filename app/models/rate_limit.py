@@ -0,0 +1,13 @@
+from sqlalchemy import Boolean, Column, Float, String
+from app.core.database import Base
+
+class RateLimitBucket(Base):
+    """Корзина токенов ограничителя частоты, общая для всех воркеров (RATE_LIMIT_BACKEND=database)"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Unix-время последнего обращения (time.time() воркера)
+    updated_at = Column(Float, nullable=False)
+    # Результат последнего обращения: UPSERT возвращает его через RETURNING
+    allowed = Column(Boolean, nullable=False, default=True)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer
+from app.core.database import Base
+
+# Сводки продаж для админки. Учитываются заказы, кроме отмененных
+# (orders.sales_counted); обновляются обработчиком outbox при создании заказа
+# и смене статуса, пересчитываются целиком командой rebuild_stats.py
+
+class SalesDaily(Base):
+    """Выручка и заказы по дням создания заказа"""
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)
+    items_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class ProductSales(Base):
+    """Продано единиц и выручка по товару за все время (по цене позиций, без скидки промокода)"""
+    __tablename__ = "product_sales"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    units_sold = Column(Integer, nullable=False, default=0, index=True)
+    revenue = Column(Float, nullable=False, default=0)
+
+class PromoDaily(Base):
+    """Применения промокода по дням: заказы с ним и их сумма"""
+    __tablename__ = "promo_daily"
+
+    day = Column(Date, primary_key=True)
+    promo_code_id = Column(Integer, ForeignKey("promo_codes.id"), primary_key=True)
+    redemptions = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
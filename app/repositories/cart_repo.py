@@ -1,7 +1,144 @@
+from sqlalchemy import Float, and_, case, delete, func, or_, select, type_coerce, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
+from app.core.cache import cart_cache, catalog_cache, promo_cache
+from app.core.database import insert_for
 from app.models.cart import Cart, CartItem
+from app.models.product import Product
+from app.models.promo import PromoApplicableProduct, PromoCode
 from app.models.user import User
 
+def _cart_id_statement(user_id: int):
+    return select(Cart.id).where(Cart.user_id == user_id)
+
+def _touch_cart_statement(user_id: int):
+    """Увеличивает версию корзины и возвращает ее id (ничего — если корзины нет)"""
+    return update(Cart).where(Cart.user_id == user_id).values(
+        version=Cart.version + 1
+    ).returning(Cart.id).execution_options(synchronize_session=False)
+
+def _summary_statement(user_id: int):
+    """Позиции корзины с ценами, скидкой промокода и итогами — одним запросом.
+
+    Одна строка на позицию (для пустой корзины — одна строка с NULL вместо
+    товара); subtotal и discount — оконные суммы по всей корзине. Скидка
+    промокода — процент от стоимости подходящих позиций; неактивный
+    промокод не дает скидки.
+    """
+    line_total = Product.price * CartItem.quantity
+    eligible = and_(
+        PromoCode.id.is_not(None),
+        CartItem.id.is_not(None),
+        or_(PromoCode.applies_to_all.is_(True), PromoApplicableProduct.product_id.is_not(None)),
+    )
+    percent = case((PromoCode.discount > 100, 100), else_=PromoCode.discount)
+    # Float: иначе деление дает Numeric и Decimal в ответе драйвера
+    line_discount = type_coerce(case((eligible, line_total * percent / 100.0), else_=0.0), Float)
+    return select(
+        Cart.id.label("cart_id"),
+        Cart.version,
+        Cart.promo_code_id,
+        PromoCode.name.label("promo_code"),
+        percent.label("discount_percent"),
+        CartItem.product_id,
+        Product.name,
+        Product.price,
+        CartItem.quantity,
+        line_total.label("line_total"),
+        line_discount.label("line_discount"),
+        eligible.label("promo_eligible"),
+        func.sum(line_total).over().label("subtotal"),
+        func.sum(line_discount).over().label("discount"),
+    ).select_from(Cart).outerjoin(
+        CartItem, CartItem.cart_id == Cart.id
+    ).outerjoin(
+        Product, Product.id == CartItem.product_id
+    ).outerjoin(
+        PromoCode, and_(PromoCode.id == Cart.promo_code_id, PromoCode.is_active.is_(True))
+    ).outerjoin(
+        PromoApplicableProduct, and_(
+            PromoApplicableProduct.promo_id == PromoCode.id,
+            PromoApplicableProduct.product_id == CartItem.product_id,
+        )
+    ).where(Cart.user_id == user_id).order_by(CartItem.product_id)
+
+def _summarize(rows) -> dict:
+    """Итоги корзины (CartSummary) из строк _summary_statement; суммы округляются до копеек"""
+    lines = [
+        {
+            "product_id": row.product_id,
+            "name": row.name,
+            "price": row.price,
+            "quantity": row.quantity,
+            "line_total": round(row.line_total, 2),
+            "discount": round(row.line_discount, 2),
+            "promo_eligible": bool(row.promo_eligible),
+        }
+        # Позиция без товара (удален, а внешние ключи не проверяются) в итоги не входит
+        for row in rows if row.product_id is not None and row.price is not None
+    ]
+    first = rows[0] if rows else None
+    subtotal = round(first.subtotal or 0, 2) if first else 0.0
+    discount = round(first.discount or 0, 2) if first else 0.0
+    return {
+        "items_count": sum(line["quantity"] for line in lines),
+        "lines": lines,
+        "promo_code": first.promo_code if first else None,
+        "discount_percent": first.discount_percent if first else None,
+        "subtotal": subtotal,
+        "discount": discount,
+        "total": round(subtotal - discount, 2),
+    }
+
+def _summary_key(cart_id: int, version: int):
+    # Цены и промокоды меняются без изменения корзины: их версии тоже в ключе
+    return (cart_id, version, catalog_cache.version, promo_cache.version)
+
+def _add_statement(db, cart_id: int, product_id: int, quantity: int):
+    """INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE: прибавляет количество"""
+    stmt = insert_for(db)(CartItem).values(cart_id=cart_id, product_id=product_id, quantity=quantity)
+    return stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + stmt.excluded.quantity}
+    ).returning(CartItem.id, CartItem.quantity)
+
+def _set_quantities_statement(db, cart_id: int, quantities: dict):
+    """Многострочный upsert: выставляет количество сразу для нескольких товаров"""
+    stmt = insert_for(db)(CartItem).values([
+        {"cart_id": cart_id, "product_id": product_id, "quantity": quantity}
+        for product_id, quantity in quantities.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={"quantity": stmt.excluded.quantity}
+    )
+
+def _existing_products_statement(product_ids):
+    # Проверка явно: SQLite без PRAGMA foreign_keys не отклонит позицию с несуществующим товаром
+    return select(func.count(Product.id)).where(Product.id.in_(list(product_ids)))
+
+def _own_item_filter(user_id: int, item_id: int):
+    # Проверка владельца подзапросом — без загрузки корзины
+    return (CartItem.id == item_id, CartItem.cart_id.in_(_cart_id_statement(user_id)))
+
+def _update_item_statement(user_id: int, item_id: int, quantity: int):
+    if quantity <= 0:
+        stmt = delete(CartItem).where(*_own_item_filter(user_id, item_id))
+    else:
+        stmt = update(CartItem).where(*_own_item_filter(user_id, item_id)).values(quantity=quantity)
+    return stmt.returning(CartItem.id).execution_options(synchronize_session=False)
+
+def _clear_statements(user_id: int):
+    return (
+        delete(CartItem).where(
+            CartItem.cart_id.in_(_cart_id_statement(user_id))
+        ).execution_options(synchronize_session=False),
+        update(Cart).where(
+            Cart.user_id == user_id
+        ).values(promo_code_id=None, version=Cart.version + 1).execution_options(synchronize_session=False),
+    )
+
 class CartRepository:
     @staticmethod
     def get_or_create_cart(db: Session, user_id: int):
@@ -16,46 +153,173 @@ class CartRepository:
             db.refresh(cart)
         return cart
 
+    @staticmethod
+    def get_or_create_cart_id(db: Session, user_id: int):
+        cart_id = db.scalar(_cart_id_statement(user_id))
+        if cart_id is None:
+            cart_id = db.scalar(insert_for(db)(Cart).values(user_id=user_id).returning(Cart.id))
+        return cart_id
+
+    @staticmethod
+    def touch_cart(db: Session, user_id: int):
+        """id корзины для изменения (создает ее при необходимости) с новой версией"""
+        cart_id = db.scalar(_touch_cart_statement(user_id))
+        if cart_id is None:
+            CartRepository.get_or_create_cart_id(db, user_id)
+            cart_id = db.scalar(_touch_cart_statement(user_id))
+        return cart_id
+
+    @staticmethod
+    def get_summary(db: Session, user_id: int) -> dict:
+        return _summarize(db.execute(_summary_statement(user_id)).all())
+
     @staticmethod
     def add_to_cart(db: Session, user_id: int, product_id: int, quantity: int = 1):
-        cart = CartRepository.get_or_create_cart(db, user_id)
-        
-        cart_item = db.query(CartItem).filter(
-            CartItem.cart_id == cart.id,
-            CartItem.product_id == product_id
-        ).first()
-        
-        if cart_item:
-            cart_item.quantity += quantity
-        else:
-            cart_item = CartItem(cart_id=cart.id, product_id=product_id, quantity=quantity)
-            db.add(cart_item)
-        
+        if not db.scalar(_existing_products_statement([product_id])):
+            return None
+        cart_id = CartRepository.touch_cart(db, user_id)
+        try:
+            cart_item = db.execute(_add_statement(db, cart_id, product_id, quantity)).first()
+        except IntegrityError:
+            db.rollback()
+            return None
         db.commit()
-        db.refresh(cart_item)
         return cart_item
 
     @staticmethod
     def update_cart_item(db: Session, user_id: int, item_id: int, quantity: int):
-        cart = CartRepository.get_or_create_cart(db, user_id)
-        cart_item = db.query(CartItem).filter(
-            CartItem.id == item_id,
-            CartItem.cart_id == cart.id
-        ).first()
+        # Сначала корзина, затем позиция — в том же порядке, что и оформление заказа
+        db.execute(_touch_cart_statement(user_id))
+        item_id = db.scalar(_update_item_statement(user_id, item_id, quantity))
+        db.commit()
+        return item_id
+
+    @staticmethod
+    def clear_cart(db: Session, user_id: int):
+        for statement in _clear_statements(user_id):
+            db.execute(statement)
+        db.commit()
+
+
+class AsyncCartRepository:
+    @staticmethod
+    async def get_or_create_cart(db: AsyncSession, user_id: int):
+        stmt = select(Cart).options(
+            joinedload(Cart.items).joinedload(CartItem.product)
+        ).where(Cart.user_id == user_id)
+        cart = (await db.execute(stmt)).unique().scalars().first()
         
-        if cart_item:
-            if quantity <= 0:
-                db.delete(cart_item)
-            else:
-                cart_item.quantity = quantity
-            db.commit()
+        if not cart:
+            # Создание без гонки (ON CONFLICT), затем та же загрузка — только при первом обращении
+            await AsyncCartRepository.get_or_create_cart_id(db, user_id)
+            await db.commit()
+            cart = (await db.execute(stmt)).unique().scalars().first()
+        return cart
+
+    @staticmethod
+    async def get_cart_product_ids(db: AsyncSession, user_id: int):
+        """(cart_id, [product_id, ...]) одним запросом, без загрузки товаров"""
+        rows = (await db.execute(
+            select(Cart.id, CartItem.product_id).outerjoin(
+                CartItem, CartItem.cart_id == Cart.id
+            ).where(Cart.user_id == user_id)
+        )).all()
         
+        if not rows:
+            cart = await AsyncCartRepository.get_or_create_cart(db, user_id)
+            return cart.id, []
+        return rows[0][0], [product_id for _, product_id in rows if product_id is not None]
+
+    @staticmethod
+    async def get_or_create_cart_id(db: AsyncSession, user_id: int):
+        cart_id = await db.scalar(_cart_id_statement(user_id))
+        if cart_id is None:
+            # Параллельный запрос мог создать корзину раньше: ON CONFLICT (user_id) ничего не вставит
+            cart_id = await db.scalar(
+                insert_for(db)(Cart).values(user_id=user_id)
+                .on_conflict_do_nothing(index_elements=[Cart.user_id])
+                .returning(Cart.id)
+            )
+            if cart_id is None:
+                cart_id = await db.scalar(_cart_id_statement(user_id))
+        return cart_id
+
+    @staticmethod
+    async def touch_cart(db: AsyncSession, user_id: int):
+        """id корзины для изменения (создает ее при необходимости) с новой версией.
+
+        UPDATE заодно блокирует строку корзины: изменения одной корзины идут по очереди.
+        """
+        cart_id = await db.scalar(_touch_cart_statement(user_id))
+        if cart_id is None:
+            await AsyncCartRepository.get_or_create_cart_id(db, user_id)
+            cart_id = await db.scalar(_touch_cart_statement(user_id))
+        return cart_id
+
+    @staticmethod
+    async def get_summary(db: AsyncSession, user_id: int) -> dict:
+        """Итоги корзины; пересчитываются только после изменения корзины, цен или промокодов"""
+        cart = (await db.execute(select(Cart.id, Cart.version).where(Cart.user_id == user_id))).first()
+        if cart is None:
+            return _summarize([])
+
+        key = _summary_key(*cart)
+        summary = cart_cache.get(key)
+        if summary is None:
+            version = cart_cache.version
+            summary = _summarize((await db.execute(_summary_statement(user_id))).all())
+            cart_cache.set(key, summary, version)
+        return summary
+
+    @staticmethod
+    async def add_to_cart(db: AsyncSession, user_id: int, product_id: int, quantity: int = 1):
+        """Добавляет товар одним upsert; None, если такого товара нет"""
+        if not await db.scalar(_existing_products_statement([product_id])):
+            return None
+        cart_id = await AsyncCartRepository.touch_cart(db, user_id)
+        try:
+            cart_item = (await db.execute(_add_statement(db, cart_id, product_id, quantity))).first()
+        except IntegrityError:
+            await db.rollback()
+            return None
+        await db.commit()
         return cart_item
 
     @staticmethod
-    def clear_cart(db: Session, user_id: int):
-        cart = CartRepository.get_or_create_cart(db, user_id)
-        db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
-        cart.promo_code_id = None
-        db.commit()
-        return cart
\ No newline at end of file
+    async def set_quantities(db: AsyncSession, user_id: int, quantities: dict):
+        """Выставляет количества {product_id: quantity} за одну транзакцию; 0 и меньше — удалить.
+
+        Возвращает False, если среди товаров есть несуществующие.
+        """
+        to_set = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+        to_remove = [product_id for product_id, quantity in quantities.items() if quantity <= 0]
+        if to_set and await db.scalar(_existing_products_statement(to_set)) != len(to_set):
+            return False
+        cart_id = await AsyncCartRepository.touch_cart(db, user_id)
+        try:
+            if to_set:
+                await db.execute(_set_quantities_statement(db, cart_id, to_set))
+            if to_remove:
+                await db.execute(delete(CartItem).where(
+                    CartItem.cart_id == cart_id, CartItem.product_id.in_(to_remove)
+                ).execution_options(synchronize_session=False))
+        except IntegrityError:
+            await db.rollback()
+            return False
+        await db.commit()
+        return True
+
+    @staticmethod
+    async def update_cart_item(db: AsyncSession, user_id: int, item_id: int, quantity: int):
+        """Меняет количество (0 и меньше — удаляет); None, если позиция не из корзины пользователя"""
+        # Сначала корзина, затем позиция — в том же порядке, что и оформление заказа
+        await db.execute(_touch_cart_statement(user_id))
+        item_id = await db.scalar(_update_item_statement(user_id, item_id, quantity))
+        await db.commit()
+        return item_id
+
+    @staticmethod
+    async def clear_cart(db: AsyncSession, user_id: int):
+        for statement in _clear_statements(user_id):
+            await db.execute(statement)
+        await db.commit()
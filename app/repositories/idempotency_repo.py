@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import insert_for
+from app.models.idempotency import IdempotencyKey
+
+@dataclass(frozen=True)
+class IdempotencyRecord:
+    """Сохраненный результат запроса; status_code = None — запрос еще выполняется"""
+    request_hash: str
+    status_code: Optional[int] = None
+    response_body: Optional[str] = None
+
+def _key_filter(user_id: int, key: str):
+    return (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+def _claim_statement(db, user_id: int, key: str, request_hash: str, now: datetime):
+    return insert_for(db)(IdempotencyKey).values(
+        user_id=user_id, key=key, request_hash=request_hash, created_at=now
+    ).on_conflict_do_nothing(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key]
+    ).returning(IdempotencyKey.key)
+
+def _takeover_statement(user_id: int, key: str, request_hash: str, now: datetime, stale_before: datetime):
+    """Ключ, занятый запросом, который так и не завершился (воркер упал), переходит новому"""
+    return update(IdempotencyKey).where(
+        *_key_filter(user_id, key),
+        IdempotencyKey.request_hash == request_hash,
+        IdempotencyKey.status_code.is_(None),
+        IdempotencyKey.created_at < stale_before,
+    ).values(created_at=now).returning(IdempotencyKey.key).execution_options(synchronize_session=False)
+
+class AsyncIdempotencyRepository:
+    @staticmethod
+    async def claim(db: AsyncSession, user_id: int, key: str, request_hash: str, now: datetime, stale_before: datetime):
+        """Занимает ключ; None — ключ наш, иначе запись первого запроса с этим ключом"""
+        claimed = await db.scalar(_claim_statement(db, user_id, key, request_hash, now))
+        if claimed is None:
+            claimed = await db.scalar(_takeover_statement(user_id, key, request_hash, now, stale_before))
+        if claimed is not None:
+            await db.commit()
+            return None
+
+        row = (await db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response_body)
+            .where(*_key_filter(user_id, key))
+        )).first()
+        await db.commit()
+        # Строку могли удалить между запросами (release) — тогда пусть клиент повторит
+        return IdempotencyRecord(*row) if row else IdempotencyRecord(request_hash)
+
+    @staticmethod
+    async def complete(db: AsyncSession, user_id: int, key: str, status_code: int, response_body: str):
+        """Сохраняет ответ в текущую транзакцию: коммит — вместе с результатом запроса"""
+        await db.execute(update(IdempotencyKey).where(*_key_filter(user_id, key)).values(
+            status_code=status_code, response_body=response_body
+        ).execution_options(synchronize_session=False))
+
+    @staticmethod
+    async def release(db: AsyncSession, user_id: int, key: str):
+        """Освобождает ключ незавершенного запроса, чтобы повтор выполнился заново"""
+        await db.execute(delete(IdempotencyKey).where(
+            *_key_filter(user_id, key), IdempotencyKey.status_code.is_(None)
+        ).execution_options(synchronize_session=False))
+        await db.commit()
+
+    @staticmethod
+    async def prune(db: AsyncSession, before: datetime) -> int:
+        result = await db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.created_at < before
+        ).execution_options(synchronize_session=False))
+        await db.commit()
+        return result.rowcount
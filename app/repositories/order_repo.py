@@ -1,46 +1,156 @@
-from sqlalchemy.orm import Session, joinedload
-from app.models.order import Order, OrderItem
+from collections import defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import case, delete, func, literal, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.core.cache import catalog_cache
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.order import Order, OrderItem, OrderStatus
 from app.models.cart import Cart, CartItem
+from app.models.product import Product, ProductStatus
+from app.repositories.cart_repo import AsyncCartRepository, CartRepository, _summarize, _summary_statement
+from app.repositories.outbox_repo import ORDER_CREATED, ORDER_STATUS_CHANGED, AsyncOutboxRepository, OutboxRepository
+
+def _reserve_statement(product_id: int, quantity: int):
+    """Списывает остаток, только если товара хватает (предзаказ — без остатка); quantity > 0.
+
+    Возвращает цену и статус товара или ничего, если остатка недостаточно.
+    Строка блокируется до конца транзакции, поэтому параллельные оформления
+    не продадут больше, чем есть на складе. preorder_count увеличивает
+    обработчик события order.created.
+    """
+    if quantity <= 0:
+        raise ValueError(f"Invalid quantity {quantity} for product {product_id}")
+    is_preorder = Product.status == ProductStatus.preorder
+    return update(Product).where(
+        Product.id == product_id,
+        or_(is_preorder, Product.stock >= quantity)
+    ).values(
+        stock=case((is_preorder, Product.stock), else_=Product.stock - quantity),
+    ).returning(Product.price, Product.status).execution_options(synchronize_session=False)
+
+def _check_lines(rows) -> Optional[str]:
+    if not rows or rows[0].product_id is None:
+        return "Cart is empty"
+    for row in rows:
+        # Неположительное количество «вернуло» бы товар на склад и дало отрицательную сумму
+        if row.quantity <= 0:
+            return f"Invalid quantity for product {row.product_id}"
+    return None
+
+def _order_created_payload(order: Order, preorders: dict) -> dict:
+    return {
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "preorders": sorted(preorders.items()),
+    }
+
+def _preorder_statement(product_id: int, quantity: int):
+    return update(Product).where(Product.id == product_id).values(
+        preorder_count=func.coalesce(Product.preorder_count, 0) + quantity
+    ).execution_options(synchronize_session=False)
+
+def _new_order(user_id: int, promo_code_id, order_data: dict, summary: dict):
+    """Заказ по итогам корзины (_summarize): сумма — с учетом скидки промокода"""
+    return Order(
+        user_id=user_id,
+        total_amount=summary["total"],
+        promo_code_id=promo_code_id,
+        customer_name=order_data.get('customer_name'),
+        customer_phone=order_data.get('customer_phone'),
+        customer_email=order_data.get('customer_email'),
+        delivery_address=order_data.get('delivery_address'),
+        # Позиции вставляются одним многострочным INSERT при flush
+        items=[
+            OrderItem(product_id=line["product_id"], quantity=line["quantity"], price=line["price"])
+            for line in summary["lines"]
+        ]
+    )
+
+def _clear_cart_statements(cart_id: int):
+    return (
+        delete(CartItem).where(CartItem.cart_id == cart_id),
+        update(Cart).where(Cart.id == cart_id).values(
+            promo_code_id=None, version=Cart.version + 1
+        ).execution_options(synchronize_session=False),
+    )
+
+def _forget_products(summary: dict):
+    # Остатки в карточках изменились; страницы списка обновятся по TTL
+    for line in summary["lines"]:
+        catalog_cache.delete(("product", line["product_id"]))
+
+# Плоские строки выгрузки: заказ + позиция (у заказа без позиций — NULL)
+EXPORT_COLUMNS = (
+    Order.id, Order.created_at, Order.status, Order.user_id, Order.total_amount,
+    Order.promo_code_id, Order.customer_name, Order.customer_phone,
+    Order.customer_email, Order.delivery_address,
+    OrderItem.product_id, OrderItem.quantity, OrderItem.price,
+)
+
+def _filter_orders(stmt, status: Optional[OrderStatus], date_from: Optional[datetime], date_to: Optional[datetime]):
+    if status is not None:
+        stmt = stmt.where(Order.status == status)
+    if date_from is not None:
+        stmt = stmt.where(Order.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Order.created_at < date_to)
+    return stmt
+
+def _decode_order_cursor(cursor: str):
+    created_at, order_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+# Поля OrderOut без позиций
+ORDER_OUT_COLUMNS = (
+    Order.id, Order.user_id, Order.created_at, Order.status, Order.total_amount,
+    Order.customer_name, Order.customer_phone, Order.customer_email, Order.delivery_address,
+)
 
 class OrderRepository:
     @staticmethod
     def create_from_cart(db: Session, user_id: int, order_data: dict):
-        cart = db.query(Cart).options(
-            joinedload(Cart.items).joinedload(CartItem.product)
-        ).filter(Cart.user_id == user_id).first()
-        
-        if not cart or not cart.items:
-            return None
-        
-        total_amount = sum(item.product.price * item.quantity for item in cart.items)
-        
-        order = Order(
-            user_id=user_id,
-            total_amount=total_amount,
-            promo_code_id=cart.promo_code_id,
-            customer_name=order_data.get('customer_name'),
-            customer_phone=order_data.get('customer_phone'),
-            customer_email=order_data.get('customer_email'),
-            delivery_address=order_data.get('delivery_address')
-        )
-        
+        """Оформляет заказ из корзины в одной транзакции; возвращает (order, error)"""
+        # Корзина блокируется до коммита: параллельное оформление или изменение
+        # корзины ждет, и очищаются ровно те позиции, что попали в заказ
+        CartRepository.touch_cart(db, user_id)
+        rows = db.execute(_summary_statement(user_id)).all()
+        error = _check_lines(rows)
+        if error:
+            db.rollback()
+            return None, error
+        cart_id, promo_code_id = rows[0].cart_id, rows[0].promo_code_id
+
+        # Строки товаров блокируются по возрастанию id — без взаимных блокировок
+        repriced, preorders = False, {}
+        for row in rows:
+            reserved = db.execute(_reserve_statement(row.product_id, row.quantity)).first()
+            if reserved is None:
+                db.rollback()
+                return None, f"Not enough stock for product {row.product_id}"
+            repriced = repriced or reserved.price != row.price
+            if reserved.status == ProductStatus.preorder:
+                preorders[row.product_id] = row.quantity
+        if repriced:
+            # Цена изменилась между чтением корзины и блокировкой товаров: теперь строки заблокированы
+            rows = db.execute(_summary_statement(user_id)).all()
+        summary = _summarize(rows)
+
+        order = _new_order(user_id, promo_code_id, order_data, summary)
         db.add(order)
+        db.flush()
+        # Побочные эффекты — фоновым воркером, но только если заказ зафиксирован
+        OutboxRepository.enqueue(db, ORDER_CREATED, _order_created_payload(order, preorders))
+        for statement in _clear_cart_statements(cart_id):
+            db.execute(statement)
         db.commit()
-        
-        for cart_item in cart.items:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=cart_item.product_id,
-                quantity=cart_item.quantity,
-                price=cart_item.product.price
-            )
-            db.add(order_item)
-        
-        db.query(CartItem).filter(CartItem.cart_id == cart.id).delete()
-        cart.promo_code_id = None
-        db.commit()
-        
-        return order
+
+        _forget_products(summary)
+        return order, None
 
     @staticmethod
     def get_user_orders(db: Session, user_id: int):
@@ -57,4 +167,173 @@ class OrderRepository:
         if user_id:
             query = query.filter(Order.user_id == user_id)
             
-        return query.first()
\ No newline at end of file
+        return query.first()
+
+
+class AsyncOrderRepository:
+    @staticmethod
+    async def create_from_cart(
+        db: AsyncSession,
+        user_id: int,
+        order_data: dict,
+        before_commit: Optional[Callable[[Order], Awaitable[None]]] = None,
+    ):
+        """Оформляет заказ из корзины в одной транзакции; возвращает (order, error).
+
+        before_commit получает записанный (flush) заказ и пишет свое в ту же
+        транзакцию — например, ответ для Idempotency-Key.
+        """
+        # Корзина блокируется до коммита: параллельное оформление или изменение
+        # корзины ждет, и очищаются ровно те позиции, что попали в заказ
+        await AsyncCartRepository.touch_cart(db, user_id)
+        rows = (await db.execute(_summary_statement(user_id))).all()
+        error = _check_lines(rows)
+        if error:
+            await db.rollback()
+            return None, error
+        cart_id, promo_code_id = rows[0].cart_id, rows[0].promo_code_id
+
+        # Строки товаров блокируются по возрастанию id — без взаимных блокировок
+        repriced, preorders = False, {}
+        for row in rows:
+            reserved = (await db.execute(_reserve_statement(row.product_id, row.quantity))).first()
+            if reserved is None:
+                await db.rollback()
+                return None, f"Not enough stock for product {row.product_id}"
+            repriced = repriced or reserved.price != row.price
+            if reserved.status == ProductStatus.preorder:
+                preorders[row.product_id] = row.quantity
+        if repriced:
+            # Цена изменилась между чтением корзины и блокировкой товаров: теперь строки заблокированы
+            rows = (await db.execute(_summary_statement(user_id))).all()
+        summary = _summarize(rows)
+
+        order = _new_order(user_id, promo_code_id, order_data, summary)
+        db.add(order)
+        await db.flush()
+        # Побочные эффекты — фоновым воркером, но только если заказ зафиксирован
+        AsyncOutboxRepository.enqueue(db, ORDER_CREATED, _order_created_payload(order, preorders))
+        for statement in _clear_cart_statements(cart_id):
+            await db.execute(statement)
+        if before_commit is not None:
+            await before_commit(order)
+        await db.commit()
+
+        _forget_products(summary)
+        return order, None
+
+    @staticmethod
+    async def record_preorders(db: AsyncSession, payloads: list):
+        """Обработчик order.created: preorder_count по всем событиям пачки — по UPDATE на товар.
+
+        Товары обновляются по возрастанию id, как и при оформлении, — без
+        взаимных блокировок. Коммит делает воркер вместе с удалением событий.
+        """
+        quantities = defaultdict(int)
+        for payload in payloads:
+            for product_id, quantity in payload.get("preorders", []):
+                quantities[product_id] += quantity
+        for product_id in sorted(quantities):
+            await db.execute(_preorder_statement(product_id, quantities[product_id]))
+        for product_id in quantities:
+            catalog_cache.delete(("product", product_id))
+
+    @staticmethod
+    async def update_status(db: AsyncSession, order_id: int, status: OrderStatus):
+        """Меняет статус заказа; сводки продаж обновит обработчик order.status_changed"""
+        order = (await db.execute(select(Order).where(Order.id == order_id).with_for_update())).scalars().first()
+        if not order:
+            return None
+        if order.status != status:
+            AsyncOutboxRepository.enqueue(db, ORDER_STATUS_CHANGED, {
+                "order_id": order.id, "old_status": order.status.value, "status": status.value,
+            })
+            order.status = status
+        await db.commit()
+        return await AsyncOrderRepository.get_order_by_id(db, order_id)
+
+    @staticmethod
+    async def get_user_order_rows(db: AsyncSession, user_id: int):
+        """История заказов словарями в форме OrderOut: два запроса по колонкам, без ORM-объектов"""
+        orders = (await db.execute(
+            select(*ORDER_OUT_COLUMNS).where(Order.user_id == user_id).order_by(Order.created_at.desc())
+        )).mappings().all()
+        if not orders:
+            return []
+
+        items = defaultdict(list)
+        rows = await db.execute(
+            select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+            .where(OrderItem.order_id.in_(select(Order.id).where(Order.user_id == user_id)))
+            .order_by(OrderItem.id)
+        )
+        for order_id, product_id, quantity, price in rows:
+            items[order_id].append({"product_id": product_id, "quantity": quantity, "price": price})
+        return [{**order, "items": items[order["id"]]} for order in orders]
+
+    @staticmethod
+    async def get_user_orders(db: AsyncSession, user_id: int):
+        result = await db.execute(
+            select(Order).options(
+                selectinload(Order.items)
+            ).where(Order.user_id == user_id).order_by(Order.created_at.desc())
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_page(
+        db: AsyncSession,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ):
+        """Страница заказов от новых к старым по ключу (created_at, id); возвращает (items, next_cursor)"""
+        stmt = _filter_orders(select(Order).options(selectinload(Order.items)), status, date_from, date_to)
+        if cursor:
+            created_at, order_id = _decode_order_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(Order.created_at, Order.id) < tuple_(literal(created_at, Order.created_at.type), literal(order_id))
+            )
+        stmt = stmt.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
+
+        orders = (await db.execute(stmt)).scalars().all()
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor([orders[-1].created_at.isoformat(), orders[-1].id])
+        return orders, next_cursor
+
+    @staticmethod
+    async def stream_export_rows(
+        db: AsyncSession,
+        status: Optional[OrderStatus] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ):
+        """Строки EXPORT_COLUMNS по возрастанию id заказа через серверный курсор.
+
+        В памяти одновременно не больше batch_size строк, ORM-объекты не создаются.
+        """
+        stmt = _filter_orders(
+            select(*EXPORT_COLUMNS).outerjoin(OrderItem, OrderItem.order_id == Order.id),
+            status, date_from, date_to
+        ).order_by(Order.id, OrderItem.id).execution_options(yield_per=batch_size)
+
+        result = await db.stream(stmt)
+        async for row in result:
+            yield row
+
+    @staticmethod
+    async def get_order_by_id(db: AsyncSession, order_id: int, user_id: int = None):
+        # populate_existing: заказ мог остаться в сессии без items после создания
+        stmt = select(Order).options(
+            selectinload(Order.items)
+        ).where(Order.id == order_id).execution_options(populate_existing=True)
+        
+        if user_id:
+            stmt = stmt.where(Order.user_id == user_id)
+            
+        return (await db.execute(stmt)).scalars().first()
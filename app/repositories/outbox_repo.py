@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.outbox import OutboxEvent
+
+# Темы событий
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+
+@dataclass(frozen=True)
+class ClaimedEvent:
+    """Захваченное событие: обработчик получает его вне сессии захвата"""
+    id: int
+    topic: str
+    payload: dict
+    attempts: int
+    created_at: datetime
+
+def _event(topic: str, payload: dict) -> OutboxEvent:
+    now = datetime.utcnow()
+    return OutboxEvent(topic=topic, payload=payload, attempts=0, available_at=now, created_at=now)
+
+def _claim_statement(limit: int, now: datetime, lease_until: datetime, max_attempts: int):
+    """Захватывает до limit готовых событий: SKIP LOCKED — параллельные воркеры берут разные"""
+    ready = select(OutboxEvent.id).where(
+        OutboxEvent.available_at <= now,
+        OutboxEvent.attempts < max_attempts,
+    ).order_by(OutboxEvent.id).limit(limit).with_for_update(skip_locked=True)
+    return update(OutboxEvent).where(OutboxEvent.id.in_(ready.scalar_subquery())).values(
+        attempts=OutboxEvent.attempts + 1, available_at=lease_until
+    ).returning(
+        OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.attempts, OutboxEvent.created_at
+    ).execution_options(synchronize_session=False)
+
+class OutboxRepository:
+    @staticmethod
+    def enqueue(db: Session, topic: str, payload: dict):
+        """Добавляет событие в текущую транзакцию: запишется только вместе с ней"""
+        db.add(_event(topic, payload))
+
+class AsyncOutboxRepository:
+    @staticmethod
+    def enqueue(db: AsyncSession, topic: str, payload: dict):
+        """Добавляет событие в текущую транзакцию: запишется только вместе с ней"""
+        db.add(_event(topic, payload))
+
+    @staticmethod
+    async def claim(db: AsyncSession, limit: int, now: datetime, lease_until: datetime, max_attempts: int):
+        rows = (await db.execute(_claim_statement(limit, now, lease_until, max_attempts))).all()
+        await db.commit()
+        return sorted((ClaimedEvent(*row) for row in rows), key=lambda event: event.id)
+
+    @staticmethod
+    async def delete(db: AsyncSession, event_ids: list):
+        """Удаляет обработанные события; коммит — вместе с эффектами обработчика"""
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(event_ids)))
+
+    @staticmethod
+    async def retry_later(db: AsyncSession, event_id: int, available_at: datetime, error: str):
+        await db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(
+            available_at=available_at, last_error=error
+        ).execution_options(synchronize_session=False))
+        await db.commit()
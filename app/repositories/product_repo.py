@@ -1,12 +1,126 @@
-from sqlalchemy.orm import Session
-from app.models.product import Product
+import asyncio
+from typing import Optional
+from sqlalchemy import func, literal, literal_column, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.search import search_index
+from app.models.product import Product, ProductStatus, SEARCH_CONFIG, SEARCH_DOCUMENT
 from app.schemas.product import ProductCreate, ProductUpdate
 
+# Колонки карточки товара в каталоге: без description/care/images
+SUMMARY_COLUMNS = (
+    Product.id, Product.name, Product.price, Product.status,
+    Product.stock, Product.preorder_count, Product.preview,
+)
+
+def _page_statement(limit, cursor, sort, status, min_price, max_price, in_stock):
+    """Запрос страницы каталога по ключу (id) или (price, id); берет limit + 1 строк"""
+    sort_columns = (Product.price, Product.id) if sort == "price" else (Product.id,)
+
+    stmt = select(Product).options(load_only(*SUMMARY_COLUMNS))
+    if status is not None:
+        stmt = stmt.where(Product.status == status)
+    if min_price is not None:
+        stmt = stmt.where(Product.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(Product.price <= max_price)
+    if in_stock:
+        stmt = stmt.where(Product.stock > 0)
+    if cursor:
+        last = decode_cursor(cursor, len(sort_columns))
+        stmt = stmt.where(tuple_(*sort_columns) > tuple_(*last))
+
+    return stmt.order_by(*sort_columns).limit(limit + 1), sort_columns
+
+def _page_result(rows, limit, sort_columns):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in sort_columns])
+    return rows, next_cursor
+
+def _search_statement(query, limit, cursor):
+    """Полнотекстовый поиск с допуском опечаток (PostgreSQL), по убыванию (rank, id).
+
+    Совпадение — по tsvector или по триграммной похожести имени; оба условия
+    обслуживаются GIN-индексами ix_products_search и ix_products_name_trgm.
+    """
+    document = literal_column(f"({SEARCH_DOCUMENT})")
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query)
+    ranked = (
+        select(Product.id, (func.ts_rank_cd(document, tsquery) + func.similarity(Product.name, query)).label("rank"))
+        .where(or_(document.op("@@")(tsquery), Product.name.op("%")(query)))
+        .subquery()
+    )
+
+    stmt = (
+        select(Product, ranked.c.rank)
+        .join(ranked, ranked.c.id == Product.id)
+        .options(load_only(*SUMMARY_COLUMNS))
+    )
+    if cursor:
+        rank, last_id = decode_cursor(cursor, 2)
+        stmt = stmt.where(tuple_(ranked.c.rank, ranked.c.id) < tuple_(literal(rank, ranked.c.rank.type), last_id))
+    return stmt.order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit + 1)
+
+def _search_page(ranked, limit):
+    """ranked — [(product, rank)] на limit + 1 строк; возвращает (items, next_cursor)"""
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        product, rank = ranked[-1]
+        next_cursor = encode_cursor([rank, product.id])
+    return [product for product, _ in ranked], next_cursor
+
+_search_index_lock = asyncio.Lock()
+
+async def _fallback_search(db: AsyncSession, query, limit, cursor):
+    """Поиск по in-memory индексу для баз без tsvector/pg_trgm (SQLite в тестах)"""
+    async with _search_index_lock:
+        version = catalog_cache.version
+        if search_index.is_stale(version, settings.CATALOG_CACHE_TTL):
+            result = await db.stream(
+                select(Product.id, Product.name, Product.description, Product.care).execution_options(yield_per=1000)
+            )
+            search_index.build([tuple(row) async for row in result], version)
+
+    matches = search_index.search(query)
+    if cursor:
+        last = tuple(decode_cursor(cursor, 2))
+        matches = [match for match in matches if match < last]
+    matches = matches[:limit + 1]
+
+    ids = [product_id for _, product_id in matches]
+    products = (await db.execute(
+        select(Product).options(load_only(*SUMMARY_COLUMNS)).where(Product.id.in_(ids))
+    )).scalars().all()
+    by_id = {product.id: product for product in products}
+    return [(by_id[product_id], score) for score, product_id in matches if product_id in by_id]
+
 class ProductRepository:
     @staticmethod
     def get_all(db: Session):
         return db.query(Product).all()
 
+    @staticmethod
+    def get_page(
+        db: Session,
+        limit: int = 24,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        status: Optional[ProductStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+    ):
+        """Страница каталога; возвращает (items, next_cursor)"""
+        stmt, sort_columns = _page_statement(limit, cursor, sort, status, min_price, max_price, in_stock)
+        rows = db.execute(stmt).scalars().all()
+        return _page_result(rows, limit, sort_columns)
+
     @staticmethod
     def get_by_id(db: Session, product_id: int):
         return db.query(Product).filter(Product.id == product_id).first()
@@ -17,6 +131,7 @@ class ProductRepository:
         db.add(db_product)
         db.commit()
         db.refresh(db_product)
+        catalog_cache.clear()
         return db_product
 
     @staticmethod
@@ -31,6 +146,7 @@ class ProductRepository:
         
         db.commit()
         db.refresh(db_product)
+        catalog_cache.clear()
         return db_product
 
     @staticmethod
@@ -39,4 +155,72 @@ class ProductRepository:
         if db_product:
             db.delete(db_product)
             db.commit()
-        return db_product
\ No newline at end of file
+            catalog_cache.clear()
+        return db_product
+
+class AsyncProductRepository:
+    @staticmethod
+    async def get_all(db: AsyncSession):
+        return (await db.execute(select(Product))).scalars().all()
+
+    @staticmethod
+    async def get_page(
+        db: AsyncSession,
+        limit: int = 24,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        status: Optional[ProductStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+    ):
+        """Страница каталога; возвращает (items, next_cursor)"""
+        stmt, sort_columns = _page_statement(limit, cursor, sort, status, min_price, max_price, in_stock)
+        rows = (await db.execute(stmt)).scalars().all()
+        return _page_result(rows, limit, sort_columns)
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, product_id: int):
+        return await db.get(Product, product_id)
+
+    @staticmethod
+    async def search(db: AsyncSession, query: str, limit: int = 24, cursor: Optional[str] = None):
+        """Поиск по имени, описанию и уходу; возвращает (items, next_cursor)"""
+        if db.get_bind().dialect.name == "postgresql":
+            ranked = (await db.execute(_search_statement(query, limit, cursor))).all()
+        else:
+            ranked = await _fallback_search(db, query, limit, cursor)
+        return _search_page([tuple(row) for row in ranked], limit)
+
+    @staticmethod
+    async def create(db: AsyncSession, product: ProductCreate):
+        db_product = Product(**product.dict())
+        db.add(db_product)
+        await db.commit()
+        await db.refresh(db_product)
+        catalog_cache.clear()
+        return db_product
+
+    @staticmethod
+    async def update(db: AsyncSession, product_id: int, product: ProductUpdate):
+        db_product = await db.get(Product, product_id)
+        if not db_product:
+            return None
+        
+        update_data = product.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_product, field, value)
+        
+        await db.commit()
+        await db.refresh(db_product)
+        catalog_cache.clear()
+        return db_product
+
+    @staticmethod
+    async def delete(db: AsyncSession, product_id: int):
+        db_product = await db.get(Product, product_id)
+        if db_product:
+            await db.delete(db_product)
+            await db.commit()
+            catalog_cache.clear()
+        return db_product
@@ -1,6 +1,72 @@
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import exists, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
+from app.core.cache import promo_cache
+from app.models.cart import Cart
 from app.models.promo import PromoCode, PromoApplicableProduct
-from app.schemas.promo import PromoCodeCreate
+from app.schemas.promo import PromoCodeCreate, PromoCodeUpdate
+
+@dataclass(frozen=True)
+class PromoDefinition:
+    """Неизменяемая часть промокода, которую можно держать в кэше (без usage_count)"""
+    id: int
+    name: str
+    discount: float
+    is_active: bool
+    applies_to_all: bool
+    product_ids: frozenset
+
+    def applies_to(self, product_ids) -> bool:
+        return self.applies_to_all or not self.product_ids.isdisjoint(product_ids)
+
+def _definition(promo: PromoCode, product_ids) -> PromoDefinition:
+    return PromoDefinition(
+        id=promo.id,
+        name=promo.name,
+        discount=promo.discount,
+        is_active=bool(promo.is_active),
+        applies_to_all=bool(promo.applies_to_all),
+        product_ids=frozenset(product_ids),
+    )
+
+def _applicable_products_statement(promo_id: int):
+    return select(PromoApplicableProduct.product_id).where(PromoApplicableProduct.promo_id == promo_id)
+
+def _redeem_statement(promo_id: int, product_ids: list):
+    """Списывает одно использование, только если промокод активен, не исчерпан
+    и подходит хотя бы к одному товару корзины; возвращает id промокода"""
+    applicable = exists().where(
+        PromoApplicableProduct.promo_id == PromoCode.id,
+        PromoApplicableProduct.product_id.in_(product_ids)
+    )
+    return update(PromoCode).where(
+        PromoCode.id == promo_id,
+        PromoCode.is_active.is_(True),
+        # usage_limit = 0 / NULL — без ограничения
+        or_(
+            PromoCode.usage_limit.is_(None),
+            PromoCode.usage_limit == 0,
+            PromoCode.usage_count < PromoCode.usage_limit
+        ),
+        or_(PromoCode.applies_to_all.is_(True), applicable)
+    ).values(
+        usage_count=PromoCode.usage_count + 1
+    ).returning(PromoCode.id).execution_options(synchronize_session=False)
+
+def _attach_to_cart_statement(cart_id: int, promo_id: int):
+    return update(Cart).where(Cart.id == cart_id).values(
+        promo_code_id=promo_id, version=Cart.version + 1
+    ).execution_options(synchronize_session=False)
+
+def _check_definition(definition: Optional[PromoDefinition], product_ids: list) -> Optional[str]:
+    # Быстрый отказ по кэшу, без обращения к БД; окончательная проверка — в UPDATE
+    if not definition or not definition.is_active:
+        return "Invalid or inactive promo code"
+    if not definition.applies_to(product_ids):
+        return "Promo code not applicable to any product in cart"
+    return None
 
 class PromoCodeRepository:
     @staticmethod
@@ -15,6 +81,21 @@ class PromoCodeRepository:
     def get_by_id(db: Session, promo_id: int):
         return db.query(PromoCode).filter(PromoCode.id == promo_id).first()
 
+    @staticmethod
+    def get_definition(db: Session, name: str) -> Optional[PromoDefinition]:
+        definition = promo_cache.get(name)
+        if definition is not None:
+            return definition or None
+
+        version = promo_cache.version
+        promo = PromoCodeRepository.get_by_name(db, name)
+        if promo:
+            product_ids = db.execute(_applicable_products_statement(promo.id)).scalars().all()
+            definition = _definition(promo, product_ids)
+        # False — закэшированное отсутствие промокода
+        promo_cache.set(name, definition or False, version)
+        return definition
+
     @staticmethod
     def create(db: Session, promo: PromoCodeCreate):
         db_promo = PromoCode(
@@ -26,8 +107,7 @@ class PromoCodeRepository:
         )
         
         db.add(db_promo)
-        db.commit()
-        db.refresh(db_promo)
+        db.flush()
         
         if not promo.applies_to_all and promo.applicable_product_ids:
             for product_id in promo.applicable_product_ids:
@@ -38,32 +118,155 @@ class PromoCodeRepository:
                 db.add(db_applicable)
         
         db.commit()
+        db.refresh(db_promo)
+        promo_cache.clear()
         return db_promo
 
     @staticmethod
-    def apply_promo_code(db: Session, promo_name: str, cart):
-        promo = db.query(PromoCode).filter(PromoCode.name == promo_name).first()
+    def update(db: Session, promo_id: int, promo: PromoCodeUpdate):
+        db_promo = db.query(PromoCode).filter(PromoCode.id == promo_id).first()
+        if not db_promo:
+            return None
         
-        if not promo or not promo.is_active:
-            return None, "Invalid or inactive promo code"
+        update_data = promo.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_promo, field, value)
         
-        if promo.usage_limit and promo.usage_count >= promo.usage_limit:
+        db.commit()
+        db.refresh(db_promo)
+        promo_cache.clear()
+        return db_promo
+
+    @staticmethod
+    def apply_promo_code(db: Session, promo_name: str, cart_id: int, product_ids: list):
+        """Применяет промокод к корзине одним условным UPDATE; возвращает (promo, error)"""
+        definition = PromoCodeRepository.get_definition(db, promo_name)
+        error = _check_definition(definition, product_ids)
+        if error:
+            return None, error
+
+        if db.execute(_redeem_statement(definition.id, product_ids)).scalar_one_or_none() is None:
+            db.rollback()
             return None, "Promo code usage limit exceeded"
+
+        db.execute(_attach_to_cart_statement(cart_id, definition.id))
+        db.commit()
+        return definition, None
+
+
+# Поля PromoCodeOut: список промокодов читается без создания ORM-объектов
+PROMO_OUT_COLUMNS = (
+    PromoCode.id, PromoCode.name, PromoCode.discount, PromoCode.usage_limit,
+    PromoCode.usage_count, PromoCode.is_active, PromoCode.applies_to_all,
+)
+
+class AsyncPromoCodeRepository:
+    @staticmethod
+    async def get_all_rows(db: AsyncSession):
+        return (await db.execute(select(*PROMO_OUT_COLUMNS).order_by(PromoCode.id))).all()
+
+    @staticmethod
+    async def get_all(db: AsyncSession):
+        return (await db.execute(select(PromoCode))).scalars().all()
+
+    @staticmethod
+    async def get_by_name(db: AsyncSession, name: str):
+        return (await db.execute(select(PromoCode).where(PromoCode.name == name))).scalars().first()
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, promo_id: int):
+        return await db.get(PromoCode, promo_id)
+
+    @staticmethod
+    async def get_definition(db: AsyncSession, name: str) -> Optional[PromoDefinition]:
+        definition = promo_cache.get(name)
+        if definition is not None:
+            return definition or None
+
+        version = promo_cache.version
+        promo = await AsyncPromoCodeRepository.get_by_name(db, name)
+        if promo:
+            product_ids = (await db.execute(_applicable_products_statement(promo.id))).scalars().all()
+            definition = _definition(promo, product_ids)
+        # False — закэшированное отсутствие промокода
+        promo_cache.set(name, definition or False, version)
+        return definition
+
+    @staticmethod
+    async def warm_definitions(db: AsyncSession) -> int:
+        """Загружает в кэш определения активных промокодов (при старте воркера)"""
+        version = promo_cache.version
+        promos = (await db.execute(
+            select(PromoCode).where(PromoCode.is_active.is_(True)).order_by(PromoCode.id).limit(promo_cache.maxsize)
+        )).scalars().all()
+        if not promos:
+            return 0
+
+        product_ids = {promo.id: [] for promo in promos}
+        rows = await db.execute(
+            select(PromoApplicableProduct.promo_id, PromoApplicableProduct.product_id)
+            .where(PromoApplicableProduct.promo_id.in_(product_ids))
+        )
+        for promo_id, product_id in rows:
+            product_ids[promo_id].append(product_id)
+
+        for promo in promos:
+            promo_cache.set(promo.name, _definition(promo, product_ids[promo.id]), version)
+        return len(promos)
+
+    @staticmethod
+    async def create(db: AsyncSession, promo: PromoCodeCreate):
+        db_promo = PromoCode(
+            name=promo.name,
+            discount=promo.discount,
+            usage_limit=promo.usage_limit,
+            is_active=promo.is_active,
+            applies_to_all=promo.applies_to_all
+        )
         
-        if not promo.applies_to_all:
-            # Получаем ID продуктов в корзине
-            cart_product_ids = [item.product_id for item in cart.items]
-            
-            # Проверяем в базе данных, есть ли связь между промокодом и продуктами в корзине
-            applicable_count = db.query(PromoApplicableProduct).filter(
-                PromoApplicableProduct.promo_id == promo.id,
-                PromoApplicableProduct.product_id.in_(cart_product_ids)
-            ).count()
-            
-            if applicable_count == 0:
-                return None, "Promo code not applicable to any product in cart"
+        db.add(db_promo)
+        await db.flush()
         
-        promo.usage_count += 1
-        db.commit()
+        if not promo.applies_to_all and promo.applicable_product_ids:
+            for product_id in promo.applicable_product_ids:
+                db_applicable = PromoApplicableProduct(
+                    promo_id=db_promo.id,
+                    product_id=product_id
+                )
+                db.add(db_applicable)
         
-        return promo, None
\ No newline at end of file
+        await db.commit()
+        await db.refresh(db_promo)
+        promo_cache.clear()
+        return db_promo
+
+    @staticmethod
+    async def update(db: AsyncSession, promo_id: int, promo: PromoCodeUpdate):
+        db_promo = await db.get(PromoCode, promo_id)
+        if not db_promo:
+            return None
+        
+        update_data = promo.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_promo, field, value)
+        
+        await db.commit()
+        await db.refresh(db_promo)
+        promo_cache.clear()
+        return db_promo
+
+    @staticmethod
+    async def apply_promo_code(db: AsyncSession, promo_name: str, cart_id: int, product_ids: list):
+        """Применяет промокод к корзине одним условным UPDATE; возвращает (promo, error)"""
+        definition = await AsyncPromoCodeRepository.get_definition(db, promo_name)
+        error = _check_definition(definition, product_ids)
+        if error:
+            return None, error
+
+        if (await db.execute(_redeem_statement(definition.id, product_ids))).scalar_one_or_none() is None:
+            await db.rollback()
+            return None, "Promo code usage limit exceeded"
+
+        await db.execute(_attach_to_cart_statement(cart_id, definition.id))
+        await db.commit()
+        return definition, None
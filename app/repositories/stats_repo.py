@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import insert_for
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.product import Product
+from app.models.promo import PromoCode
+from app.models.stats import ProductSales, PromoDaily, SalesDaily
+
+ROLLUPS = (SalesDaily, ProductSales, PromoDaily)
+
+def _counted():
+    # Сводки учитывают все заказы, кроме отмененных
+    return Order.status != OrderStatus.CANCELLED
+
+def _sync_counted_statement(order_ids: list):
+    """Приводит sales_counted к статусу; возвращает только заказы, у которых флаг изменился.
+
+    Строки заказов блокируются: параллельный обработчик или пересчет
+    (rebuild) дождется коммита и не применит тот же заказ второй раз.
+    """
+    return update(Order).where(
+        Order.id.in_(order_ids), Order.sales_counted != _counted()
+    ).values(sales_counted=_counted()).returning(
+        Order.id, Order.created_at, Order.total_amount, Order.promo_code_id, Order.sales_counted
+    ).execution_options(synchronize_session=False)
+
+def _deltas(orders, items) -> tuple:
+    """Изменения сводок: заказ, вошедший в сводки, прибавляется, выбывший — вычитается"""
+    sign = {order.id: 1 if order.sales_counted else -1 for order in orders}
+    day_of = {order.id: order.created_at.date() for order in orders}
+    daily = defaultdict(lambda: {"orders_count": 0, "items_sold": 0, "revenue": 0.0})
+    products = defaultdict(lambda: {"units_sold": 0, "revenue": 0.0})
+    promos = defaultdict(lambda: {"redemptions": 0, "revenue": 0.0})
+
+    for order in orders:
+        day = daily[day_of[order.id]]
+        day["orders_count"] += sign[order.id]
+        day["revenue"] += sign[order.id] * order.total_amount
+        if order.promo_code_id is not None:
+            promo = promos[(day_of[order.id], order.promo_code_id)]
+            promo["redemptions"] += sign[order.id]
+            promo["revenue"] += sign[order.id] * order.total_amount
+    for order_id, product_id, quantity, price in items:
+        daily[day_of[order_id]]["items_sold"] += sign[order_id] * quantity
+        product = products[product_id]
+        product["units_sold"] += sign[order_id] * quantity
+        product["revenue"] += sign[order_id] * quantity * price
+
+    return (
+        [{"day": day, **values} for day, values in sorted(daily.items())],
+        [{"product_id": product_id, **values} for product_id, values in sorted(products.items())],
+        [{"day": day, "promo_code_id": promo_id, **values} for (day, promo_id), values in sorted(promos.items())],
+    )
+
+def _add_statement(db, model, keys: tuple, rows: list):
+    """Многострочный upsert, прибавляющий значения к существующим строкам сводки.
+
+    Строки отсортированы по ключу: параллельные обработчики блокируют их
+    в одном порядке.
+    """
+    stmt = insert_for(db)(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[getattr(model, key) for key in keys],
+        set_={
+            column: getattr(model, column) + getattr(stmt.excluded, column)
+            for column in rows[0] if column not in keys
+        },
+    )
+
+def _items_per_order():
+    return select(
+        OrderItem.order_id, func.sum(OrderItem.quantity).label("units")
+    ).group_by(OrderItem.order_id).subquery()
+
+def _rebuild_statements():
+    """INSERT ... SELECT всех сводок из заказов с sales_counted"""
+    day = func.date(Order.created_at)
+    units = _items_per_order()
+    counted = Order.sales_counted.is_(True)
+    return (
+        insert(SalesDaily).from_select(
+            ["day", "orders_count", "items_sold", "revenue"],
+            select(day, func.count(Order.id), func.coalesce(func.sum(units.c.units), 0), func.sum(Order.total_amount))
+            .outerjoin(units, units.c.order_id == Order.id).where(counted).group_by(day),
+        ),
+        insert(ProductSales).from_select(
+            ["product_id", "units_sold", "revenue"],
+            select(OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.quantity * OrderItem.price))
+            .join(Order, Order.id == OrderItem.order_id).where(counted).group_by(OrderItem.product_id),
+        ),
+        insert(PromoDaily).from_select(
+            ["day", "promo_code_id", "redemptions", "revenue"],
+            select(day, Order.promo_code_id, func.count(Order.id), func.sum(Order.total_amount))
+            .where(counted, Order.promo_code_id.is_not(None)).group_by(day, Order.promo_code_id),
+        ),
+    )
+
+class StatsRepository:
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Пересчитывает сводки из всех заказов в одной транзакции; возвращает число учтенных заказов.
+
+        Сначала помечаются заказы (их строки блокируются — обработчики outbox
+        ждут), затем сводки очищаются и строятся заново. События, пришедшие
+        после коммита, увидят актуальный sales_counted и ничего не добавят.
+        """
+        db.execute(update(Order).values(sales_counted=_counted()).execution_options(synchronize_session=False))
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE sales_daily, product_sales, promo_daily IN EXCLUSIVE MODE"))
+        for model in ROLLUPS:
+            db.execute(delete(model))
+        for statement in _rebuild_statements():
+            db.execute(statement)
+        counted = db.scalar(select(func.count(Order.id)).where(Order.sales_counted.is_(True)))
+        db.commit()
+        return counted
+
+
+class AsyncStatsRepository:
+    @staticmethod
+    async def record_orders(db: AsyncSession, payloads: list):
+        """Обработчик order.created и order.status_changed: применяет изменения заказов к сводкам.
+
+        Повтор события или порядок событий не важны: применяется только
+        расхождение между sales_counted и статусом. Коммит делает воркер.
+        """
+        order_ids = sorted({payload["order_id"] for payload in payloads})
+        orders = (await db.execute(_sync_counted_statement(order_ids))).all()
+        if not orders:
+            return
+        items = (await db.execute(
+            select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+            .where(OrderItem.order_id.in_([order.id for order in orders]))
+        )).all()
+        for model, keys, rows in zip(ROLLUPS, (("day",), ("product_id",), ("day", "promo_code_id")), _deltas(orders, items)):
+            if rows:
+                await db.execute(_add_statement(db, model, keys, rows))
+
+    @staticmethod
+    async def get_daily(db: AsyncSession, date_from: date, date_to: date):
+        return (await db.execute(
+            select(SalesDaily.day, SalesDaily.orders_count, SalesDaily.items_sold, SalesDaily.revenue)
+            .where(SalesDaily.day.between(date_from, date_to)).order_by(SalesDaily.day)
+        )).mappings().all()
+
+    @staticmethod
+    async def get_top_products(db: AsyncSession, limit: int = 10):
+        """Лидеры продаж за все время: индекс по units_sold, без обхода заказов"""
+        return (await db.execute(
+            select(ProductSales.product_id, Product.name, ProductSales.units_sold, ProductSales.revenue)
+            .join(Product, Product.id == ProductSales.product_id)
+            .where(ProductSales.units_sold > 0)
+            .order_by(ProductSales.units_sold.desc(), ProductSales.product_id).limit(limit)
+        )).mappings().all()
+
+    @staticmethod
+    async def get_promos(db: AsyncSession, date_from: date, date_to: date):
+        redemptions = func.sum(PromoDaily.redemptions).label("redemptions")
+        return (await db.execute(
+            select(PromoDaily.promo_code_id, PromoCode.name, redemptions, func.sum(PromoDaily.revenue).label("revenue"))
+            .join(PromoCode, PromoCode.id == PromoDaily.promo_code_id)
+            .where(PromoDaily.day.between(date_from, date_to))
+            .group_by(PromoDaily.promo_code_id, PromoCode.name)
+            .having(redemptions > 0)
+            .order_by(redemptions.desc(), PromoDaily.promo_code_id)
+        )).mappings().all()
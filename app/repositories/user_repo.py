@@ -1,6 +1,10 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
+from app.core.cache import invalidate_principal
+from app.core.hashing import hash_password_async
 from app.core.security import get_password_hash
 
 class UserRepository:
@@ -42,4 +46,60 @@ class UserRepository:
         
         db.commit()
         db.refresh(db_user)
-        return db_user
\ No newline at end of file
+        invalidate_principal(db_user.id)
+        return db_user
+
+# Поля UserOut: список пользователей читается без создания ORM-объектов
+USER_OUT_COLUMNS = (User.id, User.email, User.first_name, User.role)
+
+class AsyncUserRepository:
+    @staticmethod
+    async def get_all_rows(db: AsyncSession):
+        return (await db.execute(select(*USER_OUT_COLUMNS).order_by(User.id))).all()
+
+    @staticmethod
+    async def get_by_email(db: AsyncSession, email: str):
+        return (await db.execute(select(User).where(User.email == email))).scalars().first()
+
+    @staticmethod
+    async def get_by_id(db: AsyncSession, user_id: int):
+        return await db.get(User, user_id)
+
+    @staticmethod
+    async def get_all(db: AsyncSession):
+        return (await db.execute(select(User))).scalars().all()
+
+    @staticmethod
+    async def create(db: AsyncSession, user: UserCreate):
+        hashed_password = await hash_password_async(user.password)
+        db_user = User(
+            email=user.email,
+            hashed_password=hashed_password,
+            first_name=user.first_name,
+            role=user.role
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+
+    @staticmethod
+    async def update(db: AsyncSession, user_id: int, user: UserUpdate):
+        db_user = await db.get(User, user_id)
+        if not db_user:
+            return None
+        
+        update_data = user.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_user, field, value)
+        
+        await db.commit()
+        await db.refresh(db_user)
+        invalidate_principal(db_user.id)
+        return db_user
+
+    @staticmethod
+    async def update_password_hash(db: AsyncSession, db_user: User, hashed_password: str):
+        db_user.hashed_password = hashed_password
+        await db.commit()
+        return db_user
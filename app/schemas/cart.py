@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class CartItemChange(BaseModel):
+    product_id: int
+    quantity: int
+
+class CartBatchUpdate(BaseModel):
+    # Итоговые количества по товарам; 0 и меньше — убрать товар из корзины
+    items: List[CartItemChange] = Field(..., min_length=1, max_length=200)
+
+
+class CartLine(BaseModel):
+    product_id: int
+    name: str
+    price: float
+    quantity: int
+    line_total: float
+    # Скидка промокода на позицию (0, если промокод к товару не относится)
+    discount: float
+    promo_eligible: bool
+
+class CartSummary(BaseModel):
+    items_count: int
+    lines: List[CartLine]
+    promo_code: Optional[str] = None
+    # Промокод хранит скидку в процентах от стоимости подходящих позиций
+    discount_percent: Optional[float] = None
+    subtotal: float
+    discount: float
+    total: float
@@ -28,4 +28,11 @@ class OrderOut(BaseModel):
     items: List[OrderItemBase]
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class OrderStatusUpdate(BaseModel):
+    status: OrderStatus
+
+class OrderPage(BaseModel):
+    items: List[OrderOut]
+    next_cursor: Optional[str] = None
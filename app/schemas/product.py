@@ -23,4 +23,20 @@ class ProductOut(ProductBase):
     id: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProductSummary(BaseModel):
+    id: int
+    name: str
+    price: float
+    status: Optional[ProductStatus] = ProductStatus.in_stock
+    stock: Optional[int] = 0
+    preorder_count: Optional[int] = 0
+    preview: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class ProductPage(BaseModel):
+    items: List[ProductSummary]
+    next_cursor: Optional[str] = None
@@ -1,18 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class PromoCodeBase(BaseModel):
     name: str
+    # Процент от стоимости подходящих товаров; при расчете больше 100 не бывает
     discount: float
     usage_limit: Optional[int] = 1
     is_active: Optional[bool] = True
     applies_to_all: Optional[bool] = True
 
 class PromoCodeCreate(PromoCodeBase):
+    discount: float = Field(..., gt=0, le=100)
     applicable_product_ids: Optional[List[int]] = []
 
 class PromoCodeUpdate(BaseModel):
-    discount: Optional[float] = None
+    discount: Optional[float] = Field(None, gt=0, le=100)
     usage_limit: Optional[int] = None
     is_active: Optional[bool] = None
 
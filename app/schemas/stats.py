@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import date
+
+class SalesTotals(BaseModel):
+    orders_count: int = 0
+    items_sold: int = 0
+    revenue: float = 0
+
+class DailySales(SalesTotals):
+    day: date
+
+class ProductSalesOut(BaseModel):
+    product_id: int
+    name: str
+    units_sold: int
+    revenue: float
+
+class PromoSalesOut(BaseModel):
+    promo_code_id: int
+    name: str
+    redemptions: int
+    revenue: float
+
+class AdminStats(BaseModel):
+    date_from: date
+    date_to: date
+    totals: SalesTotals
+    daily: List[DailySales]
+    top_products: List[ProductSalesOut]
+    promos: List[PromoSalesOut]
@@ -0,0 +1,147 @@
+"""
+Нагрузочный тест оформления заказа на одном "горячем" товаре.
+
+N покупателей одновременно оформляют корзину с одним и тем же товаром,
+остатка которого хватает не всем. Скрипт печатает пропускную способность и
+перцентили задержки, а также проверяет, что товар не продан сверх остатка.
+
+    python benchmarks/checkout_contention.py --buyers 500 --stock 100 --concurrency 50
+
+Работает с базой из DATABASE_URL (схема должна быть создана).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, insert, select, update
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models import Cart, CartItem, Order, OrderItem, OrderStatus, OutboxEvent, Product, ProductSales, User
+from app.repositories.order_repo import AsyncOrderRepository
+from app.repositories.stats_repo import AsyncStatsRepository
+
+ORDER_DATA = {
+    "customer_name": "Bench",
+    "customer_phone": "+70000000000",
+    "customer_email": "bench@example.com",
+    "delivery_address": "Bench street, 1",
+}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def seed(buyers: int, stock: int):
+    """Создает горячий товар и покупателей, у каждого в корзине одна штука товара"""
+    tag = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        product = Product(name=f"bench-hot-{tag}", price=100.0, stock=stock, images=[])
+        db.add(product)
+        await db.flush()
+
+        user_ids = (await db.execute(
+            insert(User).returning(User.id),
+            [{"email": f"bench-{tag}-{i}@example.com", "hashed_password": "-"} for i in range(buyers)],
+        )).scalars().all()
+        cart_ids = (await db.execute(
+            insert(Cart).returning(Cart.id),
+            [{"user_id": user_id} for user_id in user_ids],
+        )).scalars().all()
+        await db.execute(
+            insert(CartItem),
+            [{"cart_id": cart_id, "product_id": product.id, "quantity": 1} for cart_id in cart_ids],
+        )
+        await db.commit()
+        return product.id, list(user_ids)
+
+
+async def cleanup(product_id: int, user_ids: list):
+    """Удаляет данные прогона, включая его события outbox и вклад в сводки продаж.
+
+    События могли уже обработать воркеры API: заказы отменяются и вычитаются
+    из сводок тем же обработчиком, что и при смене статуса.
+    """
+    async with AsyncSessionLocal() as db:
+        order_ids = list((await db.scalars(select(Order.id).where(Order.user_id.in_(user_ids)))).all())
+        if order_ids:
+            await db.execute(delete(OutboxEvent).where(
+                OutboxEvent.payload["order_id"].as_integer().in_(order_ids)
+            ))
+            await db.execute(update(Order).where(Order.id.in_(order_ids)).values(status=OrderStatus.CANCELLED))
+            await AsyncStatsRepository.record_orders(db, [{"order_id": order_id} for order_id in order_ids])
+        await db.execute(delete(ProductSales).where(ProductSales.product_id == product_id))
+        await db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        await db.execute(delete(Order).where(Order.user_id.in_(user_ids)))
+        cart_ids = select(Cart.id).where(Cart.user_id.in_(user_ids))
+        await db.execute(delete(CartItem).where(CartItem.cart_id.in_(cart_ids)))
+        await db.execute(delete(Cart).where(Cart.user_id.in_(user_ids)))
+        await db.execute(delete(User).where(User.id.in_(user_ids)))
+        await db.execute(delete(Product).where(Product.id == product_id))
+        await db.commit()
+
+
+async def run(buyers: int, stock: int, concurrency: int, keep: bool):
+    product_id, user_ids = await seed(buyers, stock)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], {}
+
+    async def checkout(user_id: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    _, error = await AsyncOrderRepository.create_from_cart(db, user_id, ORDER_DATA)
+            except Exception as e:
+                error = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(checkout(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - start
+
+    async with AsyncSessionLocal() as db:
+        remaining = await db.scalar(select(Product.stock).where(Product.id == product_id))
+        sold = await db.scalar(
+            select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id)
+        )
+
+    print(f"buyers={buyers} stock={stock} concurrency={concurrency}")
+    print(f"elapsed: {elapsed:.2f}s, throughput: {buyers / elapsed:.1f} checkouts/s")
+    print("latency ms: p50={:.1f} p95={:.1f} p99={:.1f} max={:.1f}".format(
+        *(percentile(latencies, p) * 1000 for p in (50, 95, 99, 100))
+    ))
+    print(f"sold: {sold}, remaining stock: {remaining}, rejected: {errors}")
+
+    oversold = sold > stock or remaining < 0 or sold + remaining != stock
+    if not keep:
+        await cleanup(product_id, user_ids)
+    await async_engine.dispose()
+
+    if oversold:
+        print("FAIL: stock accounting is inconsistent")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout contention benchmark")
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые данные")
+    args = parser.parse_args()
+    asyncio.run(run(args.buyers, args.stock, args.concurrency, args.keep))
+
+
+if __name__ == "__main__":
+    main()
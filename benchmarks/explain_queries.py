@@ -0,0 +1,210 @@
+"""
+Планы и время горячих запросов репозиториев до и после индексов миграции 0002.
+
+Для каждого запроса выполняется EXPLAIN (ANALYZE, BUFFERS) дважды:
+"before" — в транзакции, где индексы миграции удалены (транзакция затем
+откатывается), и "after" — на текущей схеме. Печатается сводка (тип доступа
+к таблицам и медианное время), полные планы пишутся в JSON.
+
+    python benchmarks/explain_queries.py --seed --products 100000 --users 20000 --orders 200000
+    python benchmarks/explain_queries.py --output explain.json
+
+Только PostgreSQL. DROP INDEX в "before" берет эксклюзивную блокировку на
+время замера — запускайте на отдельной базе (схема: alembic upgrade head).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload, selectinload
+from app.core.database import engine
+from app.models import Cart, CartItem, Order, OrderItem, PromoCode
+from app.repositories.cart_repo import _cart_id_statement, _summary_statement
+from app.repositories.order_repo import _filter_orders
+from app.repositories.product_repo import _page_statement, _search_statement
+
+# Индексы и ограничения из migrations/versions/0002_foreign_key_and_sort_indexes.py
+MIGRATION_INDEXES = [
+    "ix_products_price_id", "ix_products_status_id", "ix_products_status_price_id",
+    "ix_products_in_stock_id", "ix_products_in_stock_price_id",
+    "ix_orders_created_at_id", "ix_orders_status_created_at_id", "ix_orders_user_id_created_at",
+    "ix_order_items_order_id", "ix_promo_codes_is_active",
+    "ix_products_search", "ix_products_name_trgm",
+]
+MIGRATION_CONSTRAINTS = [
+    ("carts", "uq_carts_user_id"),
+    ("cart_items", "uq_cart_items_cart_id_product_id"),
+]
+
+SEED = [
+    """
+    INSERT INTO users (email, hashed_password, role)
+    SELECT 'explain-' || g || '@example.com', '-', 'CLIENT' FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO products (name, description, care, price, status, stock, preorder_count, images)
+    SELECT
+        'Товар ' || g || ' ' || (ARRAY['футболка', 'худи', 'кепка', 'шорты'])[1 + g % 4],
+        'Описание ' || md5(g::text), 'Стирка при 30 градусах',
+        (g % 5000) + 0.99,
+        (ARRAY['in_stock', 'preorder', 'waiting'])[1 + g % 3]::productstatus,
+        g % 7, 0, '{}'
+    FROM generate_series(1, :products) g
+    """,
+    """
+    INSERT INTO carts (user_id)
+    SELECT id FROM users WHERE email LIKE 'explain-%' AND id NOT IN (SELECT user_id FROM carts)
+    """,
+    """
+    INSERT INTO cart_items (cart_id, product_id, quantity)
+    SELECT c.id, p.first_id + (c.id * 7 + k) % :products, 1
+    FROM carts c, generate_series(0, 2) k, (SELECT min(id) AS first_id FROM products WHERE name LIKE 'Товар %') p
+    WHERE c.user_id IN (SELECT id FROM users WHERE email LIKE 'explain-%')
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO orders (user_id, created_at, status, total_amount)
+    SELECT u.first_id + g % :users, now() - (g || ' minutes')::interval,
+           (ARRAY['PENDING', 'PROCESSING', 'COMPLETED', 'CANCELLED'])[1 + g % 4]::orderstatus, 100
+    FROM generate_series(1, :orders) g, (SELECT min(id) AS first_id FROM users WHERE email LIKE 'explain-%') u
+    """,
+    """
+    INSERT INTO order_items (order_id, product_id, quantity, price)
+    SELECT o.id, p.first_id + (o.id * 31 + k) % :products, 1, 50
+    FROM orders o, generate_series(0, 1) k, (SELECT min(id) AS first_id FROM products WHERE name LIKE 'Товар %') p
+    WHERE NOT EXISTS (SELECT 1 FROM order_items i WHERE i.order_id = o.id)
+    """,
+    """
+    INSERT INTO promo_codes (name, discount, usage_limit, usage_count, is_active, applies_to_all)
+    SELECT 'EXPLAIN' || g, 10, 100, 0, g % 50 = 0, true FROM generate_series(1, 5000) g
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+
+def seed(conn, products: int, users: int, orders: int):
+    params = {"products": products, "users": users, "orders": orders}
+    for statement in SEED:
+        conn.execute(text(statement), params)
+    conn.commit()
+    for table in ("users", "products", "carts", "cart_items", "orders", "order_items", "promo_codes"):
+        conn.execute(text(f"ANALYZE {table}"))
+    conn.commit()
+
+
+def sample_ids(conn):
+    user_id = conn.scalar(text("SELECT user_id FROM orders ORDER BY id DESC LIMIT 1"))
+    order_ids = conn.scalars(text("SELECT id FROM orders WHERE user_id = :user_id"), {"user_id": user_id}).all()
+    return user_id, order_ids[:20] or [0]
+
+
+def hot_queries(user_id: int, order_ids: list) -> dict:
+    """Запросы в том виде, в каком их строят репозитории"""
+    return {
+        "catalog_page_by_id": _page_statement(24, None, "id", None, None, None, False)[0],
+        "catalog_page_in_stock_by_price": _page_statement(24, None, "price", None, None, None, True)[0],
+        "catalog_search": _search_statement("футболка", 24, None),
+        "cart_id": _cart_id_statement(user_id),
+        "cart_load": select(Cart).options(
+            joinedload(Cart.items).joinedload(CartItem.product)
+        ).where(Cart.user_id == user_id),
+        "cart_summary": _summary_statement(user_id),
+        "order_history": select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc()),
+        "order_history_items": select(OrderItem).options(selectinload(OrderItem.product)).where(
+            OrderItem.order_id.in_(order_ids)
+        ),
+        "admin_orders_page": _filter_orders(select(Order), None, None, None).order_by(
+            Order.created_at.desc(), Order.id.desc()
+        ).limit(51),
+        "active_promo_codes": select(PromoCode).where(PromoCode.is_active.is_(True)),
+    }
+
+
+def compile_sql(statement) -> str:
+    # paramstyle named: без удвоения "%" (оператор pg_trgm), text() удвоит его сам
+    dialect = postgresql.dialect(paramstyle="named")
+    return str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def scans(plan: dict) -> list:
+    """Способы доступа к таблицам в плане: "Index Scan using ix_... on orders" и т.п."""
+    found = []
+    if "Relation Name" in plan or "Index Name" in plan:
+        description = plan["Node Type"]
+        if "Index Name" in plan:
+            description += f" using {plan['Index Name']}"
+        if "Relation Name" in plan:
+            description += f" on {plan['Relation Name']}"
+        found.append(description)
+    for child in plan.get("Plans", []):
+        found.extend(scans(child))
+    return found
+
+
+def explain(conn, sql: str, runs: int) -> dict:
+    times, result = [], None
+    for _ in range(runs):
+        result = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()[0]
+        times.append(result["Execution Time"])
+    return {
+        "execution_ms": statistics.median(times),
+        "scans": scans(result["Plan"]),
+        "plan": result,
+    }
+
+
+def drop_migration_indexes(conn):
+    for table, constraint in MIGRATION_CONSTRAINTS:
+        conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}"))
+    for index in MIGRATION_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE of hot repository queries")
+    parser.add_argument("--seed", action="store_true", help="заполнить базу тестовыми данными")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=5, help="повторов на запрос (берется медиана)")
+    parser.add_argument("--output", default="explain_report.json")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        sys.exit("EXPLAIN ANALYZE benchmark requires PostgreSQL")
+
+    with engine.connect() as conn:
+        if args.seed:
+            seed(conn, args.products, args.users, args.orders)
+        user_id, order_ids = sample_ids(conn)
+        conn.commit()
+        queries = {name: compile_sql(statement) for name, statement in hot_queries(user_id, order_ids).items()}
+
+        report = {name: {"sql": sql} for name, sql in queries.items()}
+        # DDL в PostgreSQL транзакционна: индексы вернутся после отката
+        drop_migration_indexes(conn)
+        for name, sql in queries.items():
+            report[name]["before"] = explain(conn, sql, args.runs)
+        conn.rollback()
+        for name, sql in queries.items():
+            report[name]["after"] = explain(conn, sql, args.runs)
+        conn.rollback()
+
+    print(f"{'query':34} {'before ms':>10} {'after ms':>10}  access path (after)")
+    for name, entry in report.items():
+        before, after = entry["before"], entry["after"]
+        print(f"{name:34} {before['execution_ms']:10.2f} {after['execution_ms']:10.2f}  {'; '.join(after['scans'])}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"full plans: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Воспроизводимый нагрузочный тест: смесь сценариев поверх данных benchmarks/seed.py.
+
+Виртуальные пользователи крутят сессии по весам сценариев:
+  browse   — каталог (страницы по курсору, фильтры), карточка товара;
+  search   — поиск с префиксами и опечатками;
+  checkout — вход, корзина, промокод, оформление заказа;
+  admin    — дашборд продаж и список заказов в админке с листанием.
+Для каждого эндпоинта считаются p50/p95/p99 и доля ошибок, для всего
+прогона — пропускная способность. Случайность фиксирована (--random-seed).
+
+    python benchmarks/load.py --base-url http://localhost:8000 --duration 60 --concurrency 50
+    python benchmarks/load.py --in-process --duration 30 --save-baseline baseline.json
+    python benchmarks/load.py --base-url ... --baseline baseline.json --threshold 0.2
+
+С --baseline скрипт завершается с кодом 1, если p95 эндпоинта вырос или
+пропускная способность упала больше, чем на --threshold, — так его можно
+ставить шагом CI после seed.py. --in-process поднимает приложение в том же
+процессе (httpx.ASGITransport): без сети, но клиент и сервер делят один цикл
+событий, поэтому сравнивать можно только прогоны в одном режиме.
+
+Все виртуальные пользователи идут с одного IP: у проверяемого сервера
+отключите лимиты частоты (RATE_LIMIT_ENABLED=false), в --in-process это
+делается автоматически.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from seed import ADMIN_EMAIL, LOAD_PASSWORD, PRODUCT_WORDS
+
+API = "/api/v1"
+
+# Доли сессий каждого сценария — примерно как в продовом трафике витрины
+SCENARIO_WEIGHTS = {"browse": 60, "search": 20, "checkout": 15, "admin": 5}
+
+# Опечатки и префиксы для поиска рядом с точными словами
+SEARCH_QUERIES = PRODUCT_WORDS + ["футбол", "худии", "свитшот черная", "кепк", "лонгслив белая"]
+
+# Рост задержки меньше этого порога не считается регрессией (шум на быстрых запросах)
+MIN_REGRESSION_MS = 5.0
+
+
+class Recorder:
+    """Задержки по эндпоинтам: метка -> список миллисекунд"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, expected=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            # Сетевые ошибки и (в --in-process) исключения самого приложения —
+            # ошибка эндпоинта, а не конец прогона
+            response = None
+        self.latencies[label].append((time.perf_counter() - start) * 1000)
+        if response is None or response.status_code not in expected:
+            self.errors[label] += 1
+            return None
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label, values in sorted(self.latencies.items()):
+            # quantiles нужно минимум два значения
+            cuts = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+            endpoints[label] = {
+                "requests": len(values),
+                "errors": self.errors[label],
+                "p50_ms": round(cuts[49], 2),
+                "p95_ms": round(cuts[94], 2),
+                "p99_ms": round(cuts[98], 2),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(total / elapsed, 1),
+            "endpoints": endpoints,
+        }
+
+
+class Shop:
+    """Данные, общие для виртуальных пользователей"""
+
+    def __init__(self, users: int, promos: int):
+        self.users = users
+        self.promos = promos
+        self.product_ids = []
+        self.admin_token = None
+
+
+async def login(recorder: Recorder, client: httpx.AsyncClient, email: str):
+    response = await recorder.call(
+        client, "POST /auth/login", "POST", f"{API}/auth/login",
+        data={"username": email, "password": LOAD_PASSWORD},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"} if response else None
+
+
+async def browse(recorder, client, shop, rng):
+    params = {"limit": 24}
+    if rng.random() < 0.3:
+        params.update(sort="price", in_stock="true")
+    cursor = None
+    for _ in range(rng.randint(1, 3)):
+        if cursor:
+            params["cursor"] = cursor
+        response = await recorder.call(client, "GET /products", "GET", f"{API}/products/", params=params)
+        if response is None:
+            return
+        cursor = response.json()["next_cursor"]
+        if not cursor:
+            break
+    for _ in range(rng.randint(1, 2)):
+        product_id = rng.choice(shop.product_ids)
+        await recorder.call(client, "GET /products/{id}", "GET", f"{API}/products/{product_id}")
+
+
+async def search(recorder, client, shop, rng):
+    await recorder.call(
+        client, "GET /products/search", "GET", f"{API}/products/search",
+        params={"q": rng.choice(SEARCH_QUERIES), "limit": 24},
+    )
+
+
+async def checkout(recorder, client, shop, rng):
+    headers = await login(recorder, client, f"load-{rng.randint(1, shop.users)}@example.com")
+    if headers is None:
+        return
+    items = [{"product_id": product_id, "quantity": rng.randint(1, 2)}
+             for product_id in rng.sample(shop.product_ids, rng.randint(1, 3))]
+    if not await recorder.call(client, "POST /cart/items:batch", "POST", f"{API}/cart/items:batch",
+                               json={"items": items}, headers=headers):
+        return
+    await recorder.call(client, "GET /cart/summary", "GET", f"{API}/cart/summary", headers=headers)
+    order = {
+        "customer_name": "Load user",
+        "customer_phone": "+70000000000",
+        "customer_email": "load@example.com",
+        "delivery_address": "Москва, ул. Тестовая, 1",
+    }
+    if shop.promos and rng.random() < 0.5:
+        code = f"LOAD-{rng.randint(1, shop.promos)}"
+        await recorder.call(client, "POST /cart/apply-promo", "POST", f"{API}/cart/apply-promo",
+                            json={"promo_code": code}, headers=headers)
+        order["promo_code"] = code
+    await recorder.call(client, "POST /orders", "POST", f"{API}/orders/", json=order, headers=headers)
+
+
+async def admin(recorder, client, shop, rng):
+    await recorder.call(client, "GET /admin/stats", "GET", f"{API}/admin/stats", headers=shop.admin_token)
+    params = {"limit": 50}
+    if rng.random() < 0.3:
+        params["status"] = "pending"
+    for _ in range(rng.randint(1, 3)):
+        response = await recorder.call(client, "GET /orders/admin/all", "GET", f"{API}/orders/admin/all",
+                                       params=params, headers=shop.admin_token)
+        if response is None or not response.json()["next_cursor"]:
+            break
+        params["cursor"] = response.json()["next_cursor"]
+
+
+SCENARIOS = {"browse": browse, "search": search, "checkout": checkout, "admin": admin}
+
+
+async def prepare(client: httpx.AsyncClient, shop: Shop, pages: int) -> None:
+    """Собирает id товаров из каталога и токен администратора (в замер не входит)"""
+    cursor = None
+    for _ in range(pages):
+        response = await client.get(f"{API}/products/", params={"limit": 100, **({"cursor": cursor} if cursor else {})})
+        response.raise_for_status()
+        page = response.json()
+        shop.product_ids.extend(product["id"] for product in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    if not shop.product_ids:
+        sys.exit("catalog is empty: run benchmarks/seed.py first")
+
+    shop.admin_token = await login(Recorder(), client, ADMIN_EMAIL)
+    if shop.admin_token is None:
+        sys.exit(f"cannot log in as {ADMIN_EMAIL}: run benchmarks/seed.py first")
+
+
+async def virtual_user(recorder, client, shop, rng, deadline):
+    names, weights = zip(*SCENARIO_WEIGHTS.items())
+    while time.monotonic() < deadline:
+        await SCENARIOS[rng.choices(names, weights)[0]](recorder, client, shop, rng)
+
+
+@asynccontextmanager
+async def make_client(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+            yield client
+        return
+
+    from app.core.config import settings
+    from app.main import app
+    settings.RATE_LIMIT_ENABLED = False
+    # ASGITransport не запускает lifespan — поднимаем его сами
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout) as client:
+            yield client
+
+
+async def run(args) -> dict:
+    shop = Shop(args.users, args.promos)
+    recorder = Recorder()
+    async with make_client(args) as client:
+        await prepare(client, shop, args.catalog_pages)
+        # Прогрев: кэши и пулы соединений не должны попадать в замер
+        warmup = Recorder()
+        deadline = time.monotonic() + args.warmup
+        await asyncio.gather(*(
+            virtual_user(warmup, client, shop, random.Random(f"warmup-{args.random_seed}-{i}"), deadline)
+            for i in range(args.concurrency)
+        ))
+
+        start = time.monotonic()
+        await asyncio.gather(*(
+            virtual_user(recorder, client, shop, random.Random(f"{args.random_seed}-{i}"), start + args.duration)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.monotonic() - start
+
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "random_seed": args.random_seed,
+        "mode": "in-process" if args.in_process else args.base_url,
+        "scenarios": SCENARIO_WEIGHTS,
+    }
+    return report
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Регрессии относительно базового прогона"""
+    problems = []
+    base_rps, rps = baseline["throughput_rps"], report["throughput_rps"]
+    if rps < base_rps * (1 - threshold):
+        problems.append(f"throughput {rps} rps < baseline {base_rps} rps")
+
+    for label, base in baseline["endpoints"].items():
+        current = report["endpoints"].get(label)
+        if current is None:
+            problems.append(f"{label}: no requests in this run")
+            continue
+        limit = max(base["p95_ms"] * (1 + threshold), base["p95_ms"] + MIN_REGRESSION_MS)
+        if current["p95_ms"] > limit:
+            problems.append(f"{label}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        base_rate = base["errors"] / base["requests"]
+        rate = current["errors"] / current["requests"]
+        if rate > base_rate + 0.01:
+            problems.append(f"{label}: error rate {rate:.1%} > baseline {base_rate:.1%}")
+    return problems
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    print(f"{report['requests']} requests in {report['elapsed_s']} s: {report['throughput_rps']} rps, "
+          f"{report['errors']} errors")
+    print(f"{'endpoint':26} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'base p95':>9}")
+    for label, stats in report["endpoints"].items():
+        base = (baseline or {}).get("endpoints", {}).get(label)
+        base_p95 = f"{base['p95_ms']:9.2f}" if base else f"{'-':>9}"
+        print(f"{label:26} {stats['requests']:9} {stats['errors']:7} {stats['p50_ms']:9.2f} "
+              f"{stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} {base_p95}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test with a latency regression gate")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url", help="адрес запущенного сервера")
+    target.add_argument("--in-process", action="store_true", help="приложение в этом же процессе")
+    parser.add_argument("--duration", type=float, default=60, help="длительность замера, секунд")
+    parser.add_argument("--warmup", type=float, default=5, help="прогрев перед замером, секунд")
+    parser.add_argument("--concurrency", type=int, default=50, help="виртуальных пользователей")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--users", type=int, default=100000, help="как --users у seed.py")
+    parser.add_argument("--promos", type=int, default=100, help="как --promos у seed.py")
+    parser.add_argument("--catalog-pages", type=int, default=20, help="страниц каталога для выбора товаров")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--output", help="записать отчет в JSON")
+    parser.add_argument("--save-baseline", help="записать отчет как базовый прогон")
+    parser.add_argument("--baseline", help="сравнить с базовым прогоном")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"report: {path}")
+
+    if baseline:
+        problems = compare(report, baseline, args.threshold)
+        if problems:
+            print("REGRESSION:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print(f"no regressions (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
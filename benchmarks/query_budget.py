@@ -0,0 +1,110 @@
+"""
+Проверка бюджета SQL-запросов по эндпоинтам (N+1) поверх данных benchmarks/seed.py.
+
+Каждый эндпоинт вызывается в том же процессе (httpx.ASGITransport) с
+пустыми кэшами внутри app.core.metrics.query_budget: запрос не должен
+выполнить больше SQL, чем записано в BUDGETS, и повторять один и тот же
+запрос SQL_REPEAT_THRESHOLD раз. Скрипт завершается с кодом 1 при
+превышении — его можно ставить шагом CI после seed.py.
+
+    python benchmarks/seed.py --users 100 --products 500 --orders 2000
+    python benchmarks/query_budget.py
+
+Число запросов не зависит от объема данных: если оно растет вместе с базой,
+это N+1.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from seed import ADMIN_EMAIL, LOAD_PASSWORD
+
+API = "/api/v1"
+
+# Эндпоинт -> (кто вызывает, бюджет запросов при пустых кэшах).
+# Сюда входит и загрузка пользователя по токену (1 запрос).
+BUDGETS = {
+    "GET /products/": ("anonymous", 1),
+    "GET /products/1": ("anonymous", 1),
+    "GET /cart/": ("user", 2),
+    "GET /cart/summary": ("user", 3),
+    "GET /orders/": ("user", 3),
+    "GET /orders/admin/all": ("admin", 3),
+    "GET /users/": ("admin", 2),
+    "GET /promo-codes/": ("admin", 2),
+    "GET /admin/stats": ("admin", 4),
+}
+
+
+def clear_caches() -> None:
+    from app.core.cache import cart_cache, catalog_cache, principal_cache, promo_cache
+    for cache in (catalog_cache, cart_cache, principal_cache, promo_cache):
+        cache.clear()
+
+
+async def login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post(f"{API}/auth/login", data={"username": email, "password": LOAD_PASSWORD})
+    if response.status_code != 200:
+        sys.exit(f"cannot log in as {email}: run benchmarks/seed.py first")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(user_email: str) -> list:
+    from app.core.config import settings
+    from app.core.metrics import QueryBudgetExceeded, query_budget
+    from app.main import app
+    settings.RATE_LIMIT_ENABLED = False
+
+    results = []
+    # ASGITransport не запускает lifespan — поднимаем его сами
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://query-budget") as client:
+            headers = {
+                "anonymous": {},
+                "user": await login(client, user_email),
+                "admin": await login(client, ADMIN_EMAIL),
+            }
+            # Первое обращение создает корзину — в замер это не входит
+            await client.get(f"{API}/cart/", headers=headers["user"])
+            for endpoint, (role, budget) in BUDGETS.items():
+                method, path = endpoint.split(" ", 1)
+                clear_caches()
+                problem = None
+                try:
+                    with query_budget(budget) as captured:
+                        response = await client.request(method, API + path, headers=headers[role])
+                except QueryBudgetExceeded as e:
+                    problem = str(e)
+                if response.status_code != 200:
+                    problem = f"{endpoint}: HTTP {response.status_code}"
+                count = captured[0][1].count if captured else None
+                results.append((endpoint, count, budget, problem))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-endpoint SQL statement budget check")
+    parser.add_argument("--user", default="load-1@example.com", help="покупатель из seed.py")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.user))
+    print(f"{'endpoint':26} {'statements':>10} {'budget':>7}")
+    for endpoint, count, budget, _ in results:
+        print(f"{endpoint:26} {count if count is not None else '-':>10} {budget:7}")
+
+    problems = [problem for *_, problem in results if problem]
+    if problems:
+        print("OVER BUDGET:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("all endpoints within budget")
+
+
+if __name__ == "__main__":
+    main()
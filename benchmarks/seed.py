@@ -0,0 +1,219 @@
+"""
+Генератор синтетических данных для нагрузочных тестов.
+
+Заполняет пользователей, товары, промокоды, заказы и их позиции. В PostgreSQL
+строки потоком уходят через COPY (миллионы строк за минуты, без накопления
+в памяти), в SQLite — пачками executemany. Данные детерминированы (--random-seed),
+поэтому прогоны на одинаковых параметрах сравнимы.
+
+    python benchmarks/seed.py --users 1000000 --products 100000 --orders 2000000
+
+Учетные записи: load-<1..users>@example.com и load-admin@example.com, пароль
+LOAD_PASSWORD; промокоды LOAD-<1..promos> — их использует benchmarks/load.py.
+База должна быть пустой по этим данным, схема — создана (alembic upgrade head).
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import SessionLocal, engine
+from app.core.security import get_password_hash
+from app.repositories.stats_repo import StatsRepository
+
+LOAD_PASSWORD = "loadtest"
+ADMIN_EMAIL = "load-admin@example.com"
+
+PRODUCT_WORDS = ["футболка", "худи", "кепка", "шорты", "свитшот", "лонгслив", "шапка", "сумка"]
+PRODUCT_COLORS = ["белая", "черная", "серая", "синяя", "зеленая", "красная"]
+PRODUCT_STATUSES = ["in_stock"] * 8 + ["preorder", "waiting"]
+ORDER_STATUSES = ["COMPLETED"] * 6 + ["PENDING", "PROCESSING", "CANCELLED"]
+ORDER_BLOCK = 50000
+
+
+class RowStream(io.TextIOBase):
+    """Файл для COPY FROM STDIN, который формирует CSV по мере чтения"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            batch = 0
+            for row in self._rows:
+                self._writer.writerow(row)
+                batch += 1
+                if batch == 1000:
+                    break
+            chunk = self._buffer.getvalue()
+            if not chunk:
+                break
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            self._pending += chunk
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    readline = read
+
+
+def next_id(conn, table: str) -> int:
+    return (conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar() or 0) + 1
+
+
+def write_rows(conn, table: str, columns: list, rows) -> int:
+    """Пишет строки в таблицу: COPY в PostgreSQL, executemany в остальных базах"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    # Мимо SQLAlchemy: COPY и executemany драйвера, фиксация — на том же соединении
+    raw = conn.connection
+    cursor = raw.cursor()
+    if conn.dialect.name == "postgresql":
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", RowStream(counted())
+        )
+        if "id" in columns:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))")
+    else:
+        statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        batch = []
+        for row in counted():
+            batch.append(row)
+            if len(batch) == 10000:
+                cursor.executemany(statement, batch)
+                batch = []
+        if batch:
+            cursor.executemany(statement, batch)
+    raw.commit()
+    return count
+
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    count = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:12} {count:>10} rows  {elapsed:7.1f}s  {count / max(elapsed, 1e-9):>10.0f} rows/s")
+
+
+def seed(users: int, products: int, promos: int, orders: int, rng: random.Random):
+    password_hash = get_password_hash(LOAD_PASSWORD)
+    empty_array = "{}" if engine.dialect.name == "postgresql" else "[]"
+    now = datetime.utcnow()
+
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT 1 FROM users WHERE email = :email"), {"email": ADMIN_EMAIL}).first():
+            sys.exit("load-test data is already seeded; use a fresh database")
+        first_user = next_id(conn, "users")
+
+        def user_rows():
+            yield (first_user, ADMIN_EMAIL, password_hash, "Load admin", "ADMIN")
+            for i in range(1, users + 1):
+                yield (first_user + i, f"load-{i}@example.com", password_hash, f"User {i}", "CLIENT")
+
+        timed("users", write_rows, conn, "users", ["id", "email", "hashed_password", "first_name", "role"], user_rows())
+
+        first_product = next_id(conn, "products")
+
+        def product_rows():
+            for i in range(products):
+                name = f"{rng.choice(PRODUCT_WORDS).capitalize()} {rng.choice(PRODUCT_COLORS)} {i}"
+                yield (
+                    first_product + i, name, f"Описание товара {i}: {rng.choice(PRODUCT_WORDS)}, хлопок",
+                    "Стирка при 30 градусах", round(rng.uniform(500, 15000), 2),
+                    rng.choice(PRODUCT_STATUSES), rng.randint(1000, 100000), 0, None, empty_array,
+                )
+
+        timed("products", write_rows, conn, "products", [
+            "id", "name", "description", "care", "price", "status", "stock", "preorder_count", "preview", "images",
+        ], product_rows())
+
+        first_promo = next_id(conn, "promo_codes")
+
+        def promo_rows():
+            for i in range(promos):
+                yield (first_promo + i, f"LOAD-{i + 1}", rng.choice([5, 10, 15]), 10 ** 9, 0, True, True)
+
+        timed("promo_codes", write_rows, conn, "promo_codes", [
+            "id", "name", "discount", "usage_limit", "usage_count", "is_active", "applies_to_all",
+        ], promo_rows())
+
+        first_order = next_id(conn, "orders")
+        item_id = next_id(conn, "order_items")
+        order_count = item_count = 0
+        start = time.perf_counter()
+        # Заказы и их позиции пишутся блоками, чтобы не держать все в памяти
+        for offset in range(0, orders, ORDER_BLOCK):
+            order_rows, item_rows = [], []
+            for i in range(offset, min(offset + ORDER_BLOCK, orders)):
+                order_id = first_order + i
+                total = 0.0
+                for _ in range(rng.randint(1, 4)):
+                    price = round(rng.uniform(500, 15000), 2)
+                    quantity = rng.randint(1, 3)
+                    total += price * quantity
+                    item_rows.append((item_id, order_id, first_product + rng.randrange(products), quantity, price))
+                    item_id += 1
+                user_id = first_user + 1 + rng.randrange(users)
+                created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+                order_rows.append((
+                    order_id, user_id, created_at.isoformat(sep=" "), rng.choice(ORDER_STATUSES), round(total, 2),
+                    "Load user", "+70000000000", "load@example.com", "Москва, ул. Тестовая, 1",
+                ))
+            order_count += write_rows(conn, "orders", [
+                "id", "user_id", "created_at", "status", "total_amount",
+                "customer_name", "customer_phone", "customer_email", "delivery_address",
+            ], order_rows)
+            item_count += write_rows(conn, "order_items", ["id", "order_id", "product_id", "quantity", "price"], item_rows)
+        elapsed = time.perf_counter() - start
+        print(f"{'orders':12} {order_count:>10} rows, {item_count} items  {elapsed:7.1f}s")
+
+        if conn.dialect.name == "postgresql":
+            for table in ("users", "products", "promo_codes", "orders", "order_items"):
+                conn.execute(text(f"ANALYZE {table}"))
+            conn.commit()
+
+    # Сводки продаж для GET /admin/stats — из сгенерированных заказов
+    db = SessionLocal()
+    try:
+        timed("sales stats", StatsRepository.rebuild, db)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic data generator for load tests")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--promos", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--random-seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if min(args.users, args.products) < 1:
+        sys.exit("--users and --products must be positive")
+    seed(args.users, args.products, args.promos, args.orders, random.Random(args.random_seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Сравнение кодирования списков в JSON: обычный путь FastAPI (response_model —
+проверка, serialize_response, JSONResponse через json.dumps) против
+app.core.serialization.dump_list (TypeAdapter + pydantic-core dump_json).
+
+Для каждого списочного эндпоинта данные подаются в том виде, в каком их
+отдает репозиторий: ORM-объекты для старого пути, строки/словари проекции
+для нового. База не нужна; загрузку ORM-объектов из БД замеряет
+benchmarks/explain_queries.py.
+
+    python benchmarks/serialization.py --rows 1000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core.serialization import dump_list
+from app.models import Order, OrderItem, OrderStatus, Product, ProductStatus, PromoCode, User, UserRole
+from app.repositories.order_repo import ORDER_OUT_COLUMNS
+from app.repositories.promo_repo import PROMO_OUT_COLUMNS
+from app.repositories.user_repo import USER_OUT_COLUMNS
+from app.schemas.order import OrderOut
+from app.schemas.product import ProductSummary
+from app.schemas.promo import PromoCodeOut
+from app.schemas.user import UserOut
+
+
+def row_type(columns):
+    """Аналог sqlalchemy Row для проекции: поля по атрибутам и через _mapping"""
+    base = namedtuple("Row", [column.key for column in columns])
+    return type("Row", (base,), {"__slots__": (), "_mapping": property(base._asdict)})
+
+
+def products(n):
+    rows = [
+        Product(id=i, name=f"Товар {i}", price=100.0 + i, status=ProductStatus.in_stock,
+                stock=i % 7, preorder_count=0, preview=f"/api/v1/upload/files/{i:064x}.jpg")
+        for i in range(n)
+    ]
+    return rows, rows
+
+
+def orders(n):
+    now = datetime(2026, 1, 1)
+    fields = dict(
+        user_id=1, status=OrderStatus.COMPLETED, total_amount=300.0, customer_name="Иван",
+        customer_phone="+70000000000", customer_email="ivan@example.com", delivery_address="Москва",
+    )
+    orm = [
+        Order(id=i, created_at=now - timedelta(minutes=i), items=[
+            OrderItem(product_id=i + k, quantity=1, price=100.0) for k in range(3)
+        ], **fields)
+        for i in range(n)
+    ]
+    projected = [
+        {
+            **{column.key: getattr(order, column.key) for column in ORDER_OUT_COLUMNS},
+            "items": [{"product_id": item.product_id, "quantity": item.quantity, "price": item.price} for item in order.items],
+        }
+        for order in orm
+    ]
+    return orm, projected
+
+
+def users(n):
+    Row = row_type(USER_OUT_COLUMNS)
+    orm = [User(id=i, email=f"user{i}@example.com", first_name=f"User {i}", role=UserRole.CLIENT) for i in range(n)]
+    return orm, [Row(user.id, user.email, user.first_name, user.role) for user in orm]
+
+
+def promo_codes(n):
+    Row = row_type(PROMO_OUT_COLUMNS)
+    orm = [
+        PromoCode(id=i, name=f"PROMO{i}", discount=10.0, usage_limit=100, usage_count=i % 100,
+                  is_active=True, applies_to_all=True)
+        for i in range(n)
+    ]
+    return orm, [Row(*(getattr(promo, column.key) for column in PROMO_OUT_COLUMNS)) for promo in orm]
+
+
+# (эндпоинт, схема, данные, trusted — как в обработчике)
+ENDPOINTS = [
+    ("list_products", ProductSummary, products, False),
+    ("get_user_orders", OrderOut, orders, False),
+    ("get_all_users", UserOut, users, True),
+    ("get_all_promo_codes", PromoCodeOut, promo_codes, False),
+]
+
+
+async def fastapi_path(field, rows) -> bytes:
+    content = await serialize_response(field=field, response_content=rows)
+    return JSONResponse(content).body
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List endpoint JSON serialization benchmark")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    print(f"rows={args.rows}, median of {args.repeat} runs")
+    print(f"{'endpoint':22} {'fastapi ms':>11} {'fast path ms':>13} {'speedup':>8}")
+    for name, model, build, trusted in ENDPOINTS:
+        orm_rows, projected_rows = build(args.rows)
+        field = create_response_field(name=f"Response_{name}", type_=list[model])
+
+        # Оба пути должны давать одинаковые данные
+        assert json.loads(loop.run_until_complete(fastapi_path(field, orm_rows))) == json.loads(dump_list(model, projected_rows, trusted))
+
+        slow = measure(lambda: loop.run_until_complete(fastapi_path(field, orm_rows)), args.repeat)
+        fast = measure(lambda: dump_list(model, projected_rows, trusted), args.repeat)
+        print(f"{name:22} {slow:11.2f} {fast:13.2f} {slow / fast:7.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -108,7 +108,7 @@ class AdminPanel {
 
     async loadProducts() {
         try {
-            const products = await api.getProducts();
+            const products = await api.getAllProducts();
             this.renderProducts(products);
         } catch (error) {
             console.error('Error loading products:', error);
@@ -150,9 +150,8 @@ class AdminPanel {
         tbody.innerHTML = promos.map(promo => `
             <tr>
                 <td>${promo.id}</td>
-                <td>${promo.code}</td>
-                <td>${promo.discount}${promo.type === 'percentage' ? '%' : ' ₽'}</td>
-                <td>${promo.type === 'percentage' ? 'Процент' : 'Фиксированная сумма'}</td>
+                <td>${promo.name}</td>
+                <td>${promo.discount}%</td>
                 <td>${promo.is_active ? 'Да' : 'Нет'}</td>
                 <td>
                     <div class="action-buttons">
@@ -452,9 +451,8 @@ class AdminPanel {
         
         if (promo) {
             document.getElementById('promo-modal-title').textContent = 'Редактировать промокод';
-            form.code.value = promo.code;
+            form.code.value = promo.name;
             form.discount.value = promo.discount;
-            form.type.value = promo.type;
             form.is_active.checked = promo.is_active;
         } else {
             document.getElementById('promo-modal-title').textContent = 'Добавить промокод';
@@ -467,10 +465,10 @@ class AdminPanel {
     async handlePromoSubmit(e) {
         e.preventDefault();
         const formData = new FormData(e.target);
+        // Скидка промокода — процент от стоимости подходящих товаров
         const promoData = {
-            code: formData.get('code'),
+            name: formData.get('code'),
             discount: parseFloat(formData.get('discount')),
-            type: formData.get('type'),
             is_active: formData.get('is_active') === 'on'
         };
 
@@ -21,6 +21,8 @@ class ApiClient {
     async request(endpoint, options = {}) {
         const url = `${this.baseURL}${endpoint}`;
         const config = {
+            // Cookie last_write от API (другой порт): после записи чтения идут с основной БД
+            credentials: 'include',
             headers: {
                 'Content-Type': 'application/json',
                 ...options.headers,
@@ -84,8 +86,28 @@ class ApiClient {
     }
 
     // Product endpoints
-    async getProducts() {
-        return await this.request('/products');
+    // Возвращает страницу каталога: { items, next_cursor }
+    async getProducts(params = {}) {
+        const query = new URLSearchParams(params).toString();
+        return await this.request(query ? `/products?${query}` : '/products');
+    }
+
+    // Поиск по каталогу: страница { items, next_cursor } по убыванию релевантности
+    async searchProducts(q, params = {}) {
+        const query = new URLSearchParams({ q, ...params }).toString();
+        return await this.request(`/products/search?${query}`);
+    }
+
+    // Проходит по всем страницам каталога (для админки)
+    async getAllProducts() {
+        const products = [];
+        let cursor = null;
+        do {
+            const page = await this.getProducts(cursor ? { limit: 100, cursor } : { limit: 100 });
+            products.push(...page.items);
+            cursor = page.next_cursor;
+        } while (cursor);
+        return products;
     }
 
     async getProduct(id) {
@@ -117,6 +139,11 @@ class ApiClient {
         return await this.request('/cart');
     }
 
+    // Итоги корзины (количество, суммы, скидка промокода) без списка товаров с фото и описанием
+    async getCartSummary() {
+        return await this.request('/cart/summary');
+    }
+
     async addToCart(productId, quantity = 1) {
         return await this.request('/cart/add', {
             method: 'POST',
@@ -131,6 +158,14 @@ class ApiClient {
         });
     }
 
+    // Несколько позиций одним запросом: [{ product_id, quantity }], quantity <= 0 удаляет
+    async setCartItems(items) {
+        return await this.request('/cart/items:batch', {
+            method: 'POST',
+            body: JSON.stringify({ items }),
+        });
+    }
+
     async removeFromCart(itemId) {
         return await this.request(`/cart/items/${itemId}`, {
             method: 'DELETE',
@@ -167,9 +202,14 @@ class ApiClient {
         return await this.request('/orders');
     }
 
-    async createOrder(orderData) {
+    // Повтор с тем же idempotencyKey (после таймаута) вернет уже созданный заказ
+    async createOrder(orderData, idempotencyKey = crypto.randomUUID()) {
         return await this.request('/orders', {
             method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Idempotency-Key': idempotencyKey,
+            },
             body: JSON.stringify(orderData),
         });
     }
@@ -181,6 +221,16 @@ class ApiClient {
         });
     }
 
+    // Admin dashboard: сводки продаж за период (даты YYYY-MM-DD, по умолчанию 30 дней)
+    async getAdminStats({ dateFrom, dateTo, top } = {}) {
+        const params = new URLSearchParams();
+        if (dateFrom) params.set('date_from', dateFrom);
+        if (dateTo) params.set('date_to', dateTo);
+        if (top) params.set('top', top);
+        const query = params.toString();
+        return await this.request(`/admin/stats${query ? `?${query}` : ''}`);
+    }
+
     // Upload endpoints
     async uploadImage(file) {
         const formData = new FormData();
@@ -208,8 +258,9 @@ class ApiClient {
         });
     }
 
-    getFileUrl(filename) {
-        return `${this.baseURL}/upload/files/${filename}`;
+    getFileUrl(filename, width = null) {
+        const url = `${this.baseURL}/upload/files/${filename}`;
+        return width ? `${url}?w=${width}&format=webp` : url;
     }
 }
 
@@ -14,7 +14,8 @@ class ProductManager {
 
     async loadProducts() {
         try {
-            this.products = await api.getProducts();
+            const page = await api.getProducts();
+            this.products = page.items;
         } catch (error) {
             console.error('Error loading products:', error);
             this.showMessage('Ошибка загрузки товаров', 'error');
@@ -82,11 +83,12 @@ class ProductManager {
                            product.status === 'preorder' ? 'preorder' : 'waiting';
 
         // Get image URL - if it's a full URL, use it; otherwise, construct API URL
+        // Tiles use a 640px WebP derivative instead of the full-size original
         let imageUrl = product.preview || 'static/front/product-example.png';
         if (product.preview && !product.preview.startsWith('http') && !product.preview.startsWith('/')) {
-            imageUrl = api.getFileUrl(product.preview);
+            imageUrl = api.getFileUrl(product.preview, 640);
         } else if (product.preview && product.preview.startsWith('/api/')) {
-            imageUrl = `http://localhost:8000${product.preview}`;
+            imageUrl = `http://localhost:8000${product.preview}?w=640&format=webp`;
         }
 
         return `
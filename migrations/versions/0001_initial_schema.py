@@ -0,0 +1,113 @@
+"""initial schema
+
+Схема в том виде, в каком ее создавал Base.metadata.create_all до перехода
+на миграции. Если таблицы уже есть (база создана через create_all),
+ревизия ничего не делает — достаточно продолжить цепочку.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode() and "users" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("first_name", sa.String()),
+        sa.Column("role", sa.Enum("ADMIN", "CLIENT", name="userrole")),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String()),
+        sa.Column("care", sa.String()),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("status", sa.Enum("in_stock", "preorder", "waiting", name="productstatus")),
+        sa.Column("stock", sa.Integer()),
+        sa.Column("preorder_count", sa.Integer()),
+        sa.Column("preview", sa.String()),
+        sa.Column("images", postgresql.ARRAY(sa.String()).with_variant(sa.JSON(), "sqlite")),
+    )
+
+    op.create_table(
+        "promo_codes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+        sa.Column("discount", sa.Float(), nullable=False),
+        sa.Column("usage_limit", sa.Integer()),
+        sa.Column("usage_count", sa.Integer()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("applies_to_all", sa.Boolean()),
+    )
+
+    op.create_table(
+        "promo_applicable_products",
+        sa.Column("promo_id", sa.Integer(), sa.ForeignKey("promo_codes.id"), primary_key=True),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+    )
+
+    op.create_table(
+        "carts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("promo_code_id", sa.Integer(), sa.ForeignKey("promo_codes.id")),
+    )
+
+    op.create_table(
+        "cart_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cart_id", sa.Integer(), sa.ForeignKey("carts.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+        sa.Column("quantity", sa.Integer()),
+    )
+
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("status", sa.Enum("PENDING", "PROCESSING", "COMPLETED", "CANCELLED", name="orderstatus")),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.Column("promo_code_id", sa.Integer(), sa.ForeignKey("promo_codes.id")),
+        sa.Column("customer_name", sa.String()),
+        sa.Column("customer_phone", sa.String()),
+        sa.Column("customer_email", sa.String()),
+        sa.Column("delivery_address", sa.String()),
+    )
+
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    for table in (
+        "order_items", "orders", "cart_items", "carts",
+        "promo_applicable_products", "promo_codes", "products", "users",
+    ):
+        op.drop_table(table)
+    if op.get_bind().dialect.name == "postgresql":
+        for enum in ("orderstatus", "productstatus", "userrole"):
+            op.execute(f"DROP TYPE IF EXISTS {enum}")
@@ -0,0 +1,137 @@
+"""foreign key and sort indexes
+
+Индексы под горячие запросы: загрузка корзины, история заказов, админские
+списки с keyset-пагинацией, каталог и поиск; уникальность корзины
+пользователя и строки товара в корзине (цели для INSERT ... ON CONFLICT).
+
+В PostgreSQL индексы строятся CONCURRENTLY, без блокировки записи в таблицы.
+Перед созданием уникальных ограничений дубликаты сливаются: лишние корзины
+пользователя переносятся в самую раннюю, одинаковые строки корзины
+суммируются.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (имя, таблица, колонки, параметры)
+INDEXES = [
+    ("ix_products_price_id", "products", ["price", "id"], {}),
+    ("ix_products_status_id", "products", ["status", "id"], {}),
+    ("ix_products_status_price_id", "products", ["status", "price", "id"], {}),
+    ("ix_products_in_stock_id", "products", ["id"], {"postgresql_where": sa.text("stock > 0")}),
+    ("ix_products_in_stock_price_id", "products", ["price", "id"], {"postgresql_where": sa.text("stock > 0")}),
+    ("ix_orders_created_at_id", "orders", ["created_at", "id"], {}),
+    ("ix_orders_status_created_at_id", "orders", ["status", "created_at", "id"], {}),
+    ("ix_orders_user_id_created_at", "orders", ["user_id", "created_at"], {}),
+    ("ix_order_items_order_id", "order_items", ["order_id"], {}),
+    ("ix_promo_codes_is_active", "promo_codes", ["is_active"], {}),
+]
+
+# Индекс uq_cart_items_cart_id_product_id начинается с cart_id и заменяет
+# отдельный индекс по cart_items.cart_id
+UNIQUE_CONSTRAINTS = [
+    ("uq_carts_user_id", "carts", ["user_id"]),
+    ("uq_cart_items_cart_id_product_id", "cart_items", ["cart_id", "product_id"]),
+]
+
+# Должно совпадать с SEARCH_DOCUMENT в app/models/product.py
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(care, '')), 'C')"
+)
+
+MERGE_DUPLICATES = [
+    # Строки лишних корзин пользователя -> в его самую раннюю корзину
+    """
+    UPDATE cart_items SET cart_id = (
+        SELECT min(keeper.id) FROM carts keeper JOIN carts own ON own.user_id = keeper.user_id
+        WHERE own.id = cart_items.cart_id
+    )
+    WHERE cart_id IN (
+        SELECT c.id FROM carts c WHERE EXISTS (SELECT 1 FROM carts o WHERE o.user_id = c.user_id AND o.id < c.id)
+    )
+    """,
+    # Одинаковые товары в корзине -> одна строка с суммой количеств
+    """
+    UPDATE cart_items SET quantity = (
+        SELECT sum(o.quantity) FROM cart_items o
+        WHERE o.cart_id = cart_items.cart_id AND o.product_id = cart_items.product_id
+    )
+    WHERE id IN (SELECT min(id) FROM cart_items GROUP BY cart_id, product_id HAVING count(*) > 1)
+    """,
+    """
+    DELETE FROM cart_items WHERE EXISTS (
+        SELECT 1 FROM cart_items o
+        WHERE o.cart_id = cart_items.cart_id AND o.product_id = cart_items.product_id AND o.id < cart_items.id
+    )
+    """,
+    """
+    DELETE FROM carts WHERE EXISTS (SELECT 1 FROM carts o WHERE o.user_id = carts.user_id AND o.id < carts.id)
+    """,
+]
+
+
+def _unique_constraints(inspector, table: str) -> set:
+    if inspector is None:
+        return set()
+    names = {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+    names.update(index["name"] for index in inspector.get_indexes(table) if index["unique"])
+    return names
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    postgres = bind.dialect.name == "postgresql"
+    # В offline-режиме (--sql) смотреть в базу нельзя: выводим полный DDL
+    inspector = None if context.is_offline_mode() else sa.inspect(bind)
+
+    for statement in MERGE_DUPLICATES:
+        op.execute(statement)
+    if postgres:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CREATE INDEX CONCURRENTLY не выполняется внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=postgres, **options)
+
+        for name, table, columns in UNIQUE_CONSTRAINTS:
+            if name in _unique_constraints(inspector, table):
+                continue
+            op.create_index(name, table, columns, unique=True, if_not_exists=True, postgresql_concurrently=postgres)
+            if postgres:
+                op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+        if postgres:
+            op.create_index(
+                "ix_products_search", "products", [sa.text(f"({SEARCH_DOCUMENT})")],
+                postgresql_using="gin", postgresql_concurrently=True, if_not_exists=True,
+            )
+            op.create_index(
+                "ix_products_name_trgm", "products", ["name"],
+                postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    if postgres:
+        op.drop_index("ix_products_name_trgm", table_name="products", if_exists=True)
+        op.drop_index("ix_products_search", table_name="products", if_exists=True)
+    for name, table, _ in reversed(UNIQUE_CONSTRAINTS):
+        if postgres:
+            op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+        else:
+            op.drop_index(name, table_name=table, if_exists=True)
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,27 @@
+"""cart version
+
+Счетчик изменений корзины: увеличивается каждым изменением позиций или
+промокода и служит ключом кэша итогов корзины (GET /cart/summary).
+
+В PostgreSQL 11+ добавление колонки с константным значением по умолчанию
+не переписывает таблицу.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("carts", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("carts", "version")
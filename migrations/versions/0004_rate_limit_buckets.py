@@ -0,0 +1,33 @@
+"""rate limit buckets
+
+Корзины токенов ограничителя частоты для RATE_LIMIT_BACKEND=database.
+В PostgreSQL таблица UNLOGGED: состояние ограничителя не стоит записи в WAL,
+после сбоя корзины просто начинаются заново.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    prefixes = ["UNLOGGED"] if op.get_bind().dialect.name == "postgresql" else []
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.Column("allowed", sa.Boolean(), nullable=False),
+        prefixes=prefixes,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets")
@@ -0,0 +1,35 @@
+"""outbox events
+
+Побочные эффекты оформления заказа (счетчики предзаказов и т.п.) пишутся
+в одной транзакции с заказом и выполняются фоновым воркером.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("topic", sa.String(64), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_outbox_events_available_at", "outbox_events", ["available_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_events_available_at", table_name="outbox_events")
+    op.drop_table("outbox_events")
@@ -0,0 +1,50 @@
+"""sales rollups
+
+Сводки продаж для GET /admin/stats: по дням, по товарам и по промокодам.
+orders.sales_counted отмечает заказы, уже учтенные в сводках. Для
+существующих заказов после миграции выполните python rebuild_stats.py.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("orders", sa.Column("sales_counted", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_table(
+        "sales_daily",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("orders_count", sa.Integer(), nullable=False),
+        sa.Column("items_sold", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "product_sales",
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+        sa.Column("units_sold", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_product_sales_units_sold", "product_sales", ["units_sold"])
+    op.create_table(
+        "promo_daily",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("promo_code_id", sa.Integer(), sa.ForeignKey("promo_codes.id"), primary_key=True),
+        sa.Column("redemptions", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("promo_daily")
+    op.drop_index("ix_product_sales_units_sold", table_name="product_sales")
+    op.drop_table("product_sales")
+    op.drop_table("sales_daily")
+    op.drop_column("orders", "sales_counted")
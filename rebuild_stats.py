@@ -0,0 +1,21 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.repositories.stats_repo import StatsRepository
+
+# Полный пересчет сводок продаж (sales_daily, product_sales, promo_daily) из заказов.
+# Нужен после миграции 0007 для уже существующих заказов и для сверки;
+# API можно не останавливать — текущие обработчики outbox дождутся пересчета.
+
+def rebuild_stats():
+    db = SessionLocal()
+    try:
+        counted = StatsRepository.rebuild(db)
+        print(f"Sales rollups rebuilt from {counted} orders")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_stats()